@@ -0,0 +1,133 @@
+"""Link legacy name-only rows to employees.
+
+Rows written before the employee master existed carry only a free-text
+name: `books.borrower`, `loans.borrower` and `reservations.reserver`. The
+backfill resolves those names to `Employee.id` and fills the matching
+reference column where it is still NULL.
+
+Each table is walked in primary-key ranges of `chunk_size` rows and every
+chunk is committed on its own, so a run only ever locks one chunk's rows for
+one short UPDATE and can be stopped and restarted at any point. Names shared
+by several employees are ambiguous and left for a person to fix.
+
+Only one active reservation per (book, employee) is allowed, so a legacy
+active reservation that resolves to an employee who already holds one for
+the same book is linked and cancelled.
+"""
+import os
+from collections import Counter
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import bindparam, func, select, update
+
+from .models import Book, Employee, Loan, Reservation, ReservationStatus
+
+DEFAULT_BACKFILL_CHUNK_SIZE = int(os.getenv("BACKFILL_CHUNK_SIZE", "5000"))
+
+# table -> (model, legacy name column, employee reference column)
+TARGETS = {
+    "books": (Book, Book.borrower, Book.borrower_employee_id),
+    "loans": (Loan, Loan.borrower, Loan.employee_id),
+    "reservations": (Reservation, Reservation.reserver, Reservation.employee_id),
+}
+
+@dataclass
+class BackfillReport:
+    table: str
+    linked: int = 0
+    unknown: int = 0  # no employee has the name
+    ambiguous: int = 0  # several employees share the name
+    cancelled: int = 0  # duplicate active reservations
+
+def resolve_employee_names(db):
+    """(name -> employee id for unique names, set of names shared by several employees)"""
+    rows = db.execute(select(Employee.id, Employee.name)).all()
+    counts = Counter(name for _, name in rows)
+    ids = {name: employee_id for employee_id, name in rows if counts[name] == 1}
+    return ids, {name for name, count in counts.items() if count > 1}
+
+def _split_duplicate_reservations(db, params):
+    """Move params that would create a second active reservation into their own list"""
+    rows = db.execute(
+        select(Reservation.id, Reservation.book_id, Reservation.status)
+        .where(Reservation.id.in_([p["row_id"] for p in params]))
+    ).all()
+    active = {row_id: book_id for row_id, book_id, status in rows if status == ReservationStatus.active}
+    if not active:
+        return params, []
+    taken = set(db.execute(
+        select(Reservation.book_id, Reservation.employee_id).where(
+            Reservation.book_id.in_(set(active.values())),
+            Reservation.status == ReservationStatus.active,
+            Reservation.employee_id.isnot(None)
+        )
+    ).all())
+
+    keep, duplicates = [], []
+    for p in params:
+        book_id = active.get(p["row_id"])
+        if book_id is None:
+            keep.append(p)
+        elif (book_id, p["ref_id"]) in taken:
+            duplicates.append(p)
+        else:
+            taken.add((book_id, p["ref_id"]))
+            keep.append(p)
+    return keep, duplicates
+
+def backfill_table(db, table_name: str, ids_by_name: Dict[str, int], ambiguous=frozenset(),
+                   chunk_size: int = DEFAULT_BACKFILL_CHUNK_SIZE,
+                   progress: Optional[Callable[[str, int], None]] = None) -> BackfillReport:
+    model, name_column, ref_column = TARGETS[table_name]
+    table = model.__table__
+    report = BackfillReport(table_name)
+    missing = (ref_column.is_(None), name_column.isnot(None))
+
+    first, last = db.execute(select(func.min(model.id), func.max(model.id)).where(*missing)).one()
+    if first is None:
+        return report
+
+    # Re-check the reference in the UPDATE in case a request linked the row meanwhile
+    link = (
+        update(table)
+        .where(table.c.id == bindparam("row_id"), table.c[ref_column.key].is_(None))
+        .values({ref_column.key: bindparam("ref_id")})
+    )
+    start = first - 1
+    while start < last:
+        end = start + chunk_size
+        rows = db.execute(
+            select(model.id, name_column).where(model.id > start, model.id <= end, *missing)
+        ).all()
+        params = []
+        for row_id, name in rows:
+            ref_id = ids_by_name.get(name)
+            if ref_id is not None:
+                params.append({"row_id": row_id, "ref_id": ref_id})
+            elif name in ambiguous:
+                report.ambiguous += 1
+            else:
+                report.unknown += 1
+        duplicates = []
+        if params and table_name == "reservations":
+            params, duplicates = _split_duplicate_reservations(db, params)
+        if params:
+            db.execute(link, params)
+        if duplicates:
+            db.execute(link.values(status=ReservationStatus.cancelled), duplicates)
+        db.commit()
+        report.linked += len(params) + len(duplicates)
+        report.cancelled += len(duplicates)
+        if progress:
+            progress(table_name, report.linked)
+        start = end
+    return report
+
+def backfill_employee_links(db, chunk_size: int = DEFAULT_BACKFILL_CHUNK_SIZE,
+                            progress: Optional[Callable[[str, int], None]] = None) -> List[BackfillReport]:
+    ids_by_name, ambiguous = resolve_employee_names(db)
+    return [
+        backfill_table(db, table_name, ids_by_name, ambiguous, chunk_size, progress)
+        for table_name in TARGETS
+    ]
@@ -1,7 +1,184 @@
+import logging
 import os
-from sqlalchemy import create_engine
+import time
+from contextvars import ContextVar
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+logger = logging.getLogger(__name__)
+
+def _env_bool(name, default):
+    return os.getenv(name, default).lower() in ("1", "true", "yes", "on")
+
+# Connection pool settings (environment overridable)
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", "true")
+# Checkouts that wait longer than this are logged as warnings
+POOL_WAIT_LOG_MS = float(os.getenv("DB_POOL_WAIT_LOG_MS", "100"))
+
+# Applied to every new SQLite connection
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "synchronous": "NORMAL",
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", "-65536")),  # negative = KiB
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+}
+
+def _new_wait_stats():
+    return {
+        "checkouts": 0,
+        "total_wait_ms": 0.0,
+        "max_wait_ms": 0.0,
+        "slow_checkouts": 0,
+    }
+
+pool_wait_stats = _new_wait_stats()
+async_pool_wait_stats = _new_wait_stats()
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection"""
+
+    pool_name = "sync"
+    wait_stats = pool_wait_stats
+
+    def _do_get(self):
+        start = time.perf_counter()
+        conn = super()._do_get()
+        waited_ms = (time.perf_counter() - start) * 1000
+
+        stats = self.wait_stats
+        stats["checkouts"] += 1
+        stats["total_wait_ms"] += waited_ms
+        if waited_ms > stats["max_wait_ms"]:
+            stats["max_wait_ms"] = waited_ms
+        if waited_ms >= POOL_WAIT_LOG_MS:
+            stats["slow_checkouts"] += 1
+            logger.warning("DB %s pool checkout waited %.1f ms (%s)", self.pool_name, waited_ms, self.status())
+        return conn
+
+class TimedAsyncQueuePool(TimedQueuePool, AsyncAdaptedQueuePool):
+    """TimedQueuePool for the async engine.
+
+    The checkout runs in a greenlet that awaits the asyncio queue, so the
+    time measured around it is still the time spent waiting."""
+
+    pool_name = "async"
+    wait_stats = async_pool_wait_stats
+
+class RequestQueryStats:
+    """SQL statements executed while handling one request"""
+
+    __slots__ = ("count", "total_ms", "slowest_ms", "slowest_sql", "statements")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.slowest_ms = 0.0
+        self.slowest_sql = None
+        self.statements = {}  # SQL text -> executions, to spot N+1 loops
+
+    def record(self, statement, elapsed_ms):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.statements[statement] = self.statements.get(statement, 0) + 1
+        if elapsed_ms > self.slowest_ms:
+            self.slowest_ms = elapsed_ms
+            self.slowest_sql = statement
+
+    def most_repeated(self):
+        """(statement, executions) of the most repeated statement, or (None, 0)"""
+        if not self.statements:
+            return None, 0
+        return max(self.statements.items(), key=lambda item: item[1])
+
+# Set per request by the instrumentation middleware; None outside requests
+request_query_stats: ContextVar = ContextVar("request_query_stats", default=None)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # The start time lives on the statement's execution context, not the
+    # pooled connection, so a statement that fails leaves nothing behind
+    if request_query_stats.get() is not None and context is not None:
+        context.query_started = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = request_query_stats.get()
+    started = getattr(context, "query_started", None)
+    if stats is not None and started is not None:
+        stats.record(statement, (time.perf_counter() - started) * 1000)
+
+def instrument_queries(sync_engine):
+    """Attribute every statement run on `sync_engine` to the current request"""
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+def create_db_engine(database_url):
+    """Create an engine with pooling (and SQLite pragmas) configured from env"""
+    if database_url.startswith("sqlite"):
+        engine = create_engine(
+            database_url,
+            connect_args={"check_same_thread": False},
+            poolclass=TimedQueuePool,
+            pool_size=POOL_SIZE,
+            max_overflow=MAX_OVERFLOW,
+            pool_timeout=POOL_TIMEOUT,
+        )
+        event.listen(engine, "connect", _set_sqlite_pragmas)
+        return engine
+
+    return create_engine(
+        database_url,
+        poolclass=TimedQueuePool,
+        pool_size=POOL_SIZE,
+        max_overflow=MAX_OVERFLOW,
+        pool_timeout=POOL_TIMEOUT,
+        pool_recycle=POOL_RECYCLE,
+        pool_pre_ping=POOL_PRE_PING,
+    )
+
+def async_database_url(database_url):
+    """Map a sync URL to its async driver (asyncpg / aiosqlite)"""
+    if database_url.startswith("postgresql://"):
+        return database_url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    if database_url.startswith("sqlite://"):
+        return database_url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    return database_url
+
+def create_async_db_engine(database_url):
+    """Async counterpart of create_db_engine() sharing the same pool settings"""
+    url = async_database_url(database_url)
+    if url.startswith("sqlite"):
+        engine = create_async_engine(
+            url,
+            poolclass=TimedAsyncQueuePool,
+            pool_size=POOL_SIZE,
+            max_overflow=MAX_OVERFLOW,
+            pool_timeout=POOL_TIMEOUT,
+        )
+        event.listen(engine.sync_engine, "connect", _set_sqlite_pragmas)
+        return engine
+
+    return create_async_engine(
+        url,
+        poolclass=TimedAsyncQueuePool,
+        pool_size=POOL_SIZE,
+        max_overflow=MAX_OVERFLOW,
+        pool_timeout=POOL_TIMEOUT,
+        pool_recycle=POOL_RECYCLE,
+        pool_pre_ping=POOL_PRE_PING,
+    )
 
 # Database URL from environment variable or fallback to SQLite
 DATABASE_URL = os.getenv("DATABASE_URL")
@@ -11,16 +188,20 @@ if DATABASE_URL:
     # Fix for SQLAlchemy 1.4+ compatibility with Render/Heroku
     if DATABASE_URL.startswith("postgres://"):
         DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
-    
-    engine = create_engine(DATABASE_URL)
 else:
     # Development: Use SQLite
-    SQLITE_DATABASE_URL = "sqlite:///./library.db"
-    engine = create_engine(
-        SQLITE_DATABASE_URL, connect_args={"check_same_thread": False}
-    )
+    DATABASE_URL = "sqlite:///./library.db"
+
+engine = create_db_engine(DATABASE_URL)
+
+async_engine = create_async_db_engine(DATABASE_URL)
+
+instrument_queries(engine)
+instrument_queries(async_engine.sync_engine)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Objects stay usable after commit: templates render after the handler commits
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 
 Base = declarative_base()
 
@@ -29,4 +210,8 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,181 @@
+"""Employee directory search and department facets.
+
+Searches are prefix matches on employee_id, name, name_kana and email. Each
+prefix is written as a range (`col >= 'ab' AND col < 'ac'`) that a plain
+B-tree index on the column can serve on both SQLite and PostgreSQL, plus
+the LIKE 'ab%' that keeps the result exact under any collation.
+
+Department facets (department -> employee count) come from one GROUP BY and
+are cached in-process for DEPARTMENT_CACHE_TTL seconds; employee writes call
+`invalidate_department_facets()`.
+
+The checkout typeahead is answered from an in-memory index of active
+employees: a sorted list of (casefolded key, id) pairs for employee_id, name
+and name_kana, searched with bisect. Local employee writes call
+`invalidate_employee_index()`; other workers notice changes through the
+version stamp (row count + latest updated_at), re-checked once
+EMPLOYEE_INDEX_TTL seconds have passed. As with the genre cache, the index is
+built outside the lock (callers use run_sync on the event-loop thread) and
+the lock only guards the swap.
+"""
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from sqlalchemy import and_, func, or_
+
+from .models import Employee, EmployeeStatus
+
+DEPARTMENT_CACHE_TTL = float(os.getenv("DEPARTMENT_CACHE_TTL", "60"))
+EMPLOYEE_INDEX_TTL = float(os.getenv("EMPLOYEE_INDEX_TTL", "30"))
+
+TYPEAHEAD_LIMIT = 10
+MAX_TYPEAHEAD_LIMIT = 50
+
+SEARCH_COLUMNS = (Employee.employee_id, Employee.name, Employee.name_kana, Employee.email)
+
+def _prefix_upper(prefix: str) -> Optional[str]:
+    """Smallest string greater than every string starting with `prefix`, or
+    None if there is none (the prefix is all U+10FFFF)"""
+    # The highest code point cannot be incremented; the range then ends after
+    # the shorter prefix in front of it
+    prefix = prefix.rstrip(chr(sys.maxunicode))
+    if not prefix:
+        return None
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+def prefix_match(column, prefix: str):
+    upper = _prefix_upper(prefix)
+    return and_(
+        column >= prefix,
+        *([column < upper] if upper is not None else []),
+        column.startswith(prefix, autoescape=True)
+    )
+
+def employee_search_clause(q: str):
+    """Filter expression for employees whose number, name, kana or email starts with `q`"""
+    q = q.strip()
+    return or_(*(prefix_match(column, q) for column in SEARCH_COLUMNS))
+
+_lock = threading.Lock()
+_facets: Optional[List[dict]] = None
+_loaded_at = 0.0
+_facets_generation = 0  # bumped by invalidate_department_facets()
+
+def _load_facets(db) -> List[dict]:
+    rows = db.query(Employee.department, func.count(Employee.id)).filter(
+        Employee.department.isnot(None)
+    ).group_by(Employee.department).order_by(Employee.department).all()
+    return [{"department": department, "count": count} for department, count in rows if department]
+
+def get_department_facets(db) -> List[dict]:
+    """[{'department': ..., 'count': ...}] ordered by department, cached"""
+    global _facets, _loaded_at
+    now = time.monotonic()
+    facets = _facets
+    if facets is not None and now - _loaded_at < DEPARTMENT_CACHE_TTL:
+        return facets
+
+    # Query outside the lock, as get_stats does; an invalidation meanwhile
+    # means the result may be stale, so it is returned but not cached
+    generation = _facets_generation
+    facets = _load_facets(db)
+    with _lock:
+        if generation == _facets_generation:
+            _facets = facets
+            _loaded_at = now
+    return facets
+
+def invalidate_department_facets():
+    global _facets, _facets_generation
+    with _lock:
+        _facets = None
+        _facets_generation += 1
+
+@dataclass
+class EmployeeIndex:
+    version: tuple
+    records: Dict[int, dict] = field(default_factory=dict)  # id -> API dict
+    ordered: List[dict] = field(default_factory=list)  # by employee_id
+    keys: List[tuple] = field(default_factory=list)  # sorted (casefolded key, id)
+
+    def search(self, prefix: str, limit: int = TYPEAHEAD_LIMIT) -> List[dict]:
+        """Active employees whose number, name or kana starts with `prefix`"""
+        prefix = prefix.strip().casefold()
+        if not prefix:
+            return []
+        found = {}
+        for i in range(bisect_left(self.keys, (prefix,)), len(self.keys)):
+            key, employee_id = self.keys[i]
+            if not key.startswith(prefix):
+                break
+            found.setdefault(employee_id, self.records[employee_id])
+            if len(found) >= limit:
+                break
+        return list(found.values())
+
+    def get(self, employee_id) -> Optional[dict]:
+        return self.records.get(employee_id)
+
+_index_lock = threading.Lock()
+_index: Optional[EmployeeIndex] = None
+_index_checked_at = 0.0
+_index_generation = 0  # bumped by invalidate_employee_index()
+
+def _index_version(db):
+    count, last_updated = db.query(func.count(Employee.id), func.max(Employee.updated_at)).one()
+    return (count, last_updated)
+
+def _load_index(db) -> EmployeeIndex:
+    # Read the stamp first: a write landing during the load makes it stale
+    version = _index_version(db)
+    rows = db.query(
+        Employee.id, Employee.employee_id, Employee.name, Employee.name_kana, Employee.department
+    ).filter(Employee.status == EmployeeStatus.active).order_by(Employee.employee_id).all()
+
+    index = EmployeeIndex(version=version)
+    for row in rows:
+        record = {
+            "id": row.id,
+            "employee_id": row.employee_id,
+            "name": row.name,
+            "name_kana": row.name_kana,
+            "department": row.department
+        }
+        index.records[row.id] = record
+        index.ordered.append(record)
+        for key in (row.employee_id, row.name, row.name_kana):
+            if key:
+                index.keys.append((key.casefold(), row.id))
+    index.keys.sort()
+    return index
+
+def get_employee_index(db) -> EmployeeIndex:
+    """Return the cached typeahead index, reloading it if stale"""
+    global _index, _index_checked_at
+    now = time.monotonic()
+    index = _index
+    if index is not None and (EMPLOYEE_INDEX_TTL <= 0 or now - _index_checked_at < EMPLOYEE_INDEX_TTL):
+        return index
+
+    if index is not None and _index_version(db) == index.version:
+        _index_checked_at = now
+        return index
+
+    generation = _index_generation
+    index = _load_index(db)
+    with _index_lock:
+        if generation == _index_generation:
+            _index = index
+            _index_checked_at = now
+    return index
+
+def invalidate_employee_index():
+    global _index, _index_generation
+    with _index_lock:
+        _index = None
+        _index_generation += 1
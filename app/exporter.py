@@ -0,0 +1,58 @@
+"""Streaming CSV/JSONL export.
+
+Rows are fetched as plain column tuples with `yield_per`, which makes
+SQLAlchemy use a server-side cursor (`stream_results`) on PostgreSQL, and are
+written out in chunks. Memory use depends on EXPORT_CHUNK_SIZE, not on the
+size of the table.
+"""
+import csv
+import io
+import json
+import os
+from datetime import datetime
+from enum import Enum
+
+from .database import SessionLocal
+
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "1000"))
+
+def _plain(value):
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+def _stream_rows(build_statement):
+    """Run the statement from `build_statement(db)` in its own session and yield rows.
+
+    The session is opened here rather than taken from get_db because the
+    response body is produced after the request handler has returned.
+    """
+    db = SessionLocal()
+    try:
+        stmt = build_statement(db).execution_options(yield_per=EXPORT_CHUNK_SIZE)
+        for partition in db.execute(stmt).partitions():
+            yield partition
+    finally:
+        db.close()
+
+def stream_csv(build_statement, columns):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for partition in _stream_rows(build_statement):
+        for row in partition:
+            writer.writerow(["" if value is None else _plain(value) for value in row])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def stream_jsonl(build_statement, columns):
+    for partition in _stream_rows(build_statement):
+        yield "".join(
+            json.dumps({col: _plain(value) for col, value in zip(columns, row)}, ensure_ascii=False) + "\n"
+            for row in partition
+        )
@@ -0,0 +1,111 @@
+"""In-process cache of the genre hierarchy.
+
+All genres are loaded with a single query and the tree, the flattened
+dropdown list and the JSON tree are built in memory. Local genre writes call
+`invalidate_genre_cache()`. Other workers notice changes through the version
+stamp (row count + latest updated_at), which is re-checked with one cheap
+aggregate query once GENRE_CACHE_TTL seconds have passed. A TTL of 0 disables
+the re-check (single-worker deployments).
+
+The tree is loaded outside the lock, which only guards the swap, because the
+async routes call get_genre_tree through run_sync on the event-loop thread
+(see stats.py).
+"""
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from sqlalchemy import func
+
+from .models import Genre
+
+GENRE_CACHE_TTL = float(os.getenv("GENRE_CACHE_TTL", "30"))
+
+MAX_DROPDOWN_LEVEL = 3
+
+@dataclass
+class GenreTree:
+    version: tuple
+    genres: List = field(default_factory=list)  # ordered by (level, name)
+    children: Dict[Optional[int], List] = field(default_factory=dict)  # parent_id -> genres by name
+
+    def tree(self, parent_id=None):
+        """Nested [{'genre': ..., 'children': [...]}] used by genres_list.html"""
+        return [
+            {"genre": genre, "children": self.tree(genre.id)}
+            for genre in self.children.get(parent_id, [])
+        ]
+
+    def api_tree(self, parent_id=None):
+        return [
+            {"id": genre.id, "name": genre.name, "level": genre.level, "children": self.api_tree(genre.id)}
+            for genre in self.children.get(parent_id, [])
+        ]
+
+    def dropdown(self, parent_id=None, level=1, prefix=""):
+        """Flattened list in hierarchical order for <select> options"""
+        result = []
+        for genre in self.children.get(parent_id, []):
+            result.append({
+                "id": genre.id,
+                "name": genre.name,
+                "display_name": f"{prefix}{genre.name}",
+                "level": level
+            })
+            if level < MAX_DROPDOWN_LEVEL:
+                result.extend(self.dropdown(genre.id, level + 1, f"{prefix}{genre.name} / "))
+        return result
+
+    def parent_options(self, exclude_id=None):
+        """Genres that may become a parent (levels 1 and 2)"""
+        return [g for g in self.genres if g.level < MAX_DROPDOWN_LEVEL and g.id != exclude_id]
+
+_lock = threading.Lock()
+_snapshot: Optional[GenreTree] = None
+_checked_at = 0.0
+_generation = 0  # bumped by invalidate_genre_cache()
+
+def _version(db):
+    count, last_updated = db.query(func.count(Genre.id), func.max(Genre.updated_at)).one()
+    return (count, last_updated)
+
+def _load(db) -> GenreTree:
+    rows = db.query(
+        Genre.id, Genre.name, Genre.parent_id, Genre.level, Genre.description, Genre.updated_at
+    ).order_by(Genre.level, Genre.name).all()
+
+    children = {}
+    for row in sorted(rows, key=lambda r: r.name):
+        children.setdefault(row.parent_id, []).append(row)
+
+    last_updated = max((row.updated_at for row in rows), default=None)
+    return GenreTree(version=(len(rows), last_updated), genres=rows, children=children)
+
+def get_genre_tree(db) -> GenreTree:
+    """Return the cached genre hierarchy, reloading it if stale"""
+    global _snapshot, _checked_at
+    now = time.monotonic()
+    snapshot = _snapshot
+    if snapshot is not None and (GENRE_CACHE_TTL <= 0 or now - _checked_at < GENRE_CACHE_TTL):
+        return snapshot
+
+    if snapshot is not None and _version(db) == snapshot.version:
+        _checked_at = now
+        return snapshot
+
+    generation = _generation
+    snapshot = _load(db)
+    with _lock:
+        if generation == _generation:
+            _snapshot = snapshot
+            _checked_at = now
+    return snapshot
+
+def invalidate_genre_cache():
+    """Drop the cached hierarchy; the next reader rebuilds it"""
+    global _snapshot, _generation
+    with _lock:
+        _snapshot = None
+        _generation += 1
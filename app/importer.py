@@ -0,0 +1,198 @@
+"""Streaming bulk import of books from CSV or JSONL.
+
+Rows are read one at a time, validated, and inserted in batches: one
+executemany INSERT per batch (COPY on PostgreSQL), committed per batch so a
+large file makes steady progress. Genre names resolve through an in-memory
+name -> id map loaded once; unknown names are kept in the legacy `genre`
+column, and a `genre_id` that names no genre rejects the row. ISBNs are
+deduplicated within each batch and, when the batch is flushed, against the
+database, which by then holds every earlier batch of the file; memory stays
+bounded by the batch size.
+"""
+import csv
+import io
+import json
+import os
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Iterator, List, Optional
+
+from sqlalchemy import insert
+
+from .models import Book, BookStatus, Genre
+
+DEFAULT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+# A batch is held in memory and sent as one statement
+MAX_IMPORT_BATCH = int(os.getenv("MAX_IMPORT_BATCH", "10000"))
+# Only the first rejects are kept in the report; all are counted
+MAX_REPORTED_REJECTS = 1000
+
+COPY_COLUMNS = [
+    "title", "author", "description", "genre_id", "genre", "isbn", "publisher",
+    "publication_year", "pages", "status", "created_at", "updated_at",
+]
+
+@dataclass
+class ImportReport:
+    read: int = 0
+    inserted: int = 0
+    duplicates: int = 0
+    rejected: int = 0
+    rejects: List[dict] = field(default_factory=list)
+
+    def reject(self, line: int, reason: str):
+        self.rejected += 1
+        if len(self.rejects) < MAX_REPORTED_REJECTS:
+            self.rejects.append({"line": line, "reason": reason})
+
+def clamp_batch_size(batch_size: Optional[int]) -> int:
+    """Clamp a requested batch size to 1..MAX_IMPORT_BATCH"""
+    if not batch_size or batch_size < 1:
+        return DEFAULT_BATCH_SIZE
+    return min(batch_size, MAX_IMPORT_BATCH)
+
+def detect_format(filename: str) -> str:
+    return "jsonl" if filename.lower().endswith((".jsonl", ".ndjson", ".json")) else "csv"
+
+def iter_rows(stream, fmt: str) -> Iterator[tuple]:
+    """Yield (line number, dict) pairs from a text stream without reading it whole"""
+    if fmt == "jsonl":
+        for line_no, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                yield line_no, None
+                continue
+            yield line_no, row if isinstance(row, dict) else None
+    else:
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+
+def _text(row, key):
+    value = row.get(key)
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+def _int(row, key):
+    value = _text(row, key)
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"{key} は整数で指定してください")
+
+def _parse_row(row, genre_ids, known_genre_ids, now):
+    title = _text(row, "title")
+    author = _text(row, "author")
+    if not title or not author:
+        raise ValueError("タイトルと著者は必須です")
+
+    genre_name = _text(row, "genre")
+    genre_id = _int(row, "genre_id")
+    if genre_id is not None and genre_id not in known_genre_ids:
+        raise ValueError(f"genre_id {genre_id} のジャンルは存在しません")
+    if genre_id is None and genre_name:
+        genre_id = genre_ids.get(genre_name)
+
+    return {
+        "title": title,
+        "author": author,
+        "description": _text(row, "description"),
+        "genre_id": genre_id,
+        "genre": genre_name,  # Keep for backward compatibility
+        "isbn": _text(row, "isbn"),
+        "publisher": _text(row, "publisher"),
+        "publication_year": _int(row, "publication_year"),
+        "pages": _int(row, "pages"),
+        "status": BookStatus.available,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+def _copy_rows(db, rows):
+    """Insert rows with PostgreSQL COPY through the psycopg2 connection"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([
+            row[col].value if col == "status" else ("" if row[col] is None else row[col])
+            for col in COPY_COLUMNS
+        ])
+    buffer.seek(0)
+    cursor = db.connection().connection.cursor()
+    # Unquoted empty fields are NULL in CSV COPY
+    cursor.copy_expert(f"COPY books ({', '.join(COPY_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+def _flush(db, batch, report):
+    isbns = [row["isbn"] for row in batch if row["isbn"]]
+    if isbns:
+        existing = {isbn for (isbn,) in db.query(Book.isbn).filter(Book.isbn.in_(isbns))}
+        if existing:
+            kept = [row for row in batch if row["isbn"] not in existing]
+            report.duplicates += len(batch) - len(kept)
+            batch = kept
+    if not batch:
+        return
+
+    if db.get_bind().dialect.name == "postgresql":
+        _copy_rows(db, batch)
+    else:
+        db.execute(insert(Book), batch)
+    db.commit()
+    report.inserted += len(batch)
+
+def import_books(
+    db,
+    stream,
+    fmt: str = "csv",
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    progress: Optional[Callable[[ImportReport], None]] = None,
+    report: Optional[ImportReport] = None,
+) -> ImportReport:
+    """Import books from a text stream of CSV or JSONL rows.
+
+    Pass `report` to keep the counts of the batches already committed if
+    reading the stream fails part way."""
+    report = report or ImportReport()
+    genre_ids = {name: genre_id for name, genre_id in db.query(Genre.name, Genre.id)}
+    known_genre_ids = set(genre_ids.values())
+    batch = []
+    batch_isbns = set()
+    now = datetime.utcnow()
+
+    for line_no, row in iter_rows(stream, fmt):
+        report.read += 1
+        if row is None:
+            report.reject(line_no, "行を解析できません")
+            continue
+        try:
+            book = _parse_row(row, genre_ids, known_genre_ids, now)
+        except ValueError as e:
+            report.reject(line_no, str(e))
+            continue
+
+        if book["isbn"]:
+            if book["isbn"] in batch_isbns:
+                report.duplicates += 1
+                continue
+            batch_isbns.add(book["isbn"])
+
+        batch.append(book)
+        if len(batch) >= batch_size:
+            _flush(db, batch, report)
+            batch = []
+            batch_isbns.clear()
+            if progress:
+                progress(report)
+
+    if batch:
+        _flush(db, batch, report)
+    if progress:
+        progress(report)
+    return report
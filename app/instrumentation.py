@@ -0,0 +1,74 @@
+"""Per-request SQL query counting and timing.
+
+The middleware gives each request a RequestQueryStats (see database.py),
+which the cursor-execute hooks on both engines fill in. When the handler
+returns, the totals go out as a ``Server-Timing`` header, e.g.
+``db;dur=4.2;desc="3 queries", app;dur=11.8``, and as one key=value log line
+on the ``app.requests`` logger (INFO). Latency and in-flight requests are
+also recorded in the Prometheus metrics (see metrics.py).
+
+Slow-request logging is opt-in: requests slower than SLOW_REQUEST_MS, or
+issuing at least SLOW_REQUEST_QUERIES statements, are logged at WARNING with
+the slowest statement and the most repeated one (the usual N+1 signature).
+
+For streaming responses the numbers cover the handler only, not statements
+run while the body is streamed.
+"""
+import logging
+import os
+import time
+
+from . import metrics
+from .database import RequestQueryStats, request_query_stats
+
+logger = logging.getLogger("app.requests")
+
+# 0 disables the respective slow-request trigger
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "0"))
+SLOW_REQUEST_QUERIES = int(os.getenv("SLOW_REQUEST_QUERIES", "0"))
+
+def _one_line(sql):
+    return " ".join(sql.split()) if sql else None
+
+def server_timing(stats, total_ms):
+    return f'db;dur={stats.total_ms:.1f};desc="{stats.count} queries", app;dur={total_ms:.1f}'
+
+def is_slow(stats, total_ms):
+    return (SLOW_REQUEST_MS > 0 and total_ms >= SLOW_REQUEST_MS) or \
+        (SLOW_REQUEST_QUERIES > 0 and stats.count >= SLOW_REQUEST_QUERIES)
+
+def route_name(request):
+    """Route template (e.g. /books/{book_id}) so metric labels stay bounded"""
+    route = request.scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+async def instrument_request(request, call_next):
+    stats = RequestQueryStats()
+    token = request_query_stats.set(stats)
+    in_progress = metrics.REQUESTS_IN_PROGRESS.labels(request.method)
+    in_progress.inc()
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        request_query_stats.reset(token)
+        in_progress.dec()
+    elapsed = time.perf_counter() - started
+    total_ms = elapsed * 1000
+    metrics.observe_request(request.method, route_name(request), response.status_code, elapsed)
+
+    response.headers["Server-Timing"] = server_timing(stats, total_ms)
+    logger.info(
+        "method=%s path=%s status=%s duration_ms=%.1f db_queries=%d db_ms=%.1f db_slowest_ms=%.1f",
+        request.method, request.url.path, response.status_code, total_ms,
+        stats.count, stats.total_ms, stats.slowest_ms
+    )
+    if is_slow(stats, total_ms):
+        repeated_sql, repeated = stats.most_repeated()
+        logger.warning(
+            "slow request method=%s path=%s duration_ms=%.1f db_queries=%d db_ms=%.1f "
+            "slowest_ms=%.1f slowest_sql=%r most_repeated=%d most_repeated_sql=%r",
+            request.method, request.url.path, total_ms, stats.count, stats.total_ms,
+            stats.slowest_ms, _one_line(stats.slowest_sql), repeated, _one_line(repeated_sql)
+        )
+    return response
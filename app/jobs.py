@@ -0,0 +1,122 @@
+"""Periodic background jobs run inside the application lifespan.
+
+The overdue sweeper flags loans past their due date with one bulk UPDATE, so
+GET handlers never have to write. Each worker runs its own sweeper; the
+UPDATE only touches rows not yet flagged, so concurrent runs are harmless.
+
+The hold sweeper cancels reservation holds past their expires_at in one bulk
+UPDATE and passes those books to the next in line (see reservations.py).
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime
+
+from sqlalchemy import update
+from starlette.concurrency import run_in_threadpool
+
+from .database import SessionLocal
+from .metrics import LOANS_MARKED_OVERDUE
+from .models import Loan
+from .reservations import expire_holds
+
+logger = logging.getLogger(__name__)
+
+# Seconds between sweeps; 0 disables the background task
+OVERDUE_SWEEP_INTERVAL = float(os.getenv("OVERDUE_SWEEP_INTERVAL", "300"))
+HOLD_SWEEP_INTERVAL = float(os.getenv("HOLD_SWEEP_INTERVAL", "300"))
+
+overdue_job_status = {
+    "interval_seconds": OVERDUE_SWEEP_INTERVAL,
+    "runs": 0,
+    "last_run_at": None,
+    "last_rows_marked": 0,
+    "total_rows_marked": 0,
+    "last_error": None,
+}
+
+hold_job_status = {
+    "interval_seconds": HOLD_SWEEP_INTERVAL,
+    "runs": 0,
+    "last_run_at": None,
+    "last_holds_expired": 0,
+    "total_holds_expired": 0,
+    "last_error": None,
+}
+
+_tasks = []
+
+def mark_overdue_loans(db) -> int:
+    """Flag every unreturned loan past its due date; returns the affected row count"""
+    result = db.execute(
+        update(Loan)
+        .where(
+            Loan.returned_at.is_(None),
+            Loan.due_date < datetime.now(),
+            Loan.is_overdue.is_(False)
+        )
+        .values(is_overdue=True)
+    )
+    db.commit()
+    return result.rowcount
+
+def run_overdue_sweep():
+    db = SessionLocal()
+    try:
+        rows = mark_overdue_loans(db)
+        overdue_job_status["last_error"] = None
+    except Exception as e:
+        db.rollback()
+        overdue_job_status["last_error"] = str(e)
+        logger.exception("Overdue sweep failed")
+        rows = 0
+    finally:
+        db.close()
+
+    overdue_job_status["runs"] += 1
+    overdue_job_status["last_run_at"] = datetime.now().isoformat()
+    overdue_job_status["last_rows_marked"] = rows
+    overdue_job_status["total_rows_marked"] += rows
+    LOANS_MARKED_OVERDUE.inc(rows)
+    return rows
+
+def run_hold_sweep():
+    db = SessionLocal()
+    try:
+        expired = expire_holds(db)
+        hold_job_status["last_error"] = None
+    except Exception as e:
+        db.rollback()
+        hold_job_status["last_error"] = str(e)
+        logger.exception("Hold sweep failed")
+        expired = 0
+    finally:
+        db.close()
+
+    hold_job_status["runs"] += 1
+    hold_job_status["last_run_at"] = datetime.now().isoformat()
+    hold_job_status["last_holds_expired"] = expired
+    hold_job_status["total_holds_expired"] += expired
+    return expired
+
+async def _overdue_sweeper():
+    while True:
+        await run_in_threadpool(run_overdue_sweep)
+        await asyncio.sleep(OVERDUE_SWEEP_INTERVAL)
+
+async def _hold_sweeper():
+    while True:
+        await run_in_threadpool(run_hold_sweep)
+        await asyncio.sleep(HOLD_SWEEP_INTERVAL)
+
+def start_background_jobs():
+    if OVERDUE_SWEEP_INTERVAL > 0:
+        _tasks.append(asyncio.create_task(_overdue_sweeper()))
+    if HOLD_SWEEP_INTERVAL > 0:
+        _tasks.append(asyncio.create_task(_hold_sweeper()))
+
+async def stop_background_jobs():
+    for task in _tasks:
+        task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
+    _tasks.clear()
@@ -0,0 +1,183 @@
+"""Atomic checkout and return operations.
+
+Each operation is a conditional UPDATE on `books` (the status check lives in
+the WHERE clause) followed by the loan write in the same transaction. The
+database serialises concurrent UPDATEs on the same row, so only one request
+can move a book out of `available`; the others match zero rows and lose.
+On the success path this is three statements plus COMMIT (the book, the
+loan, and completing the borrower's reservation), with no prior SELECTs.
+
+Books on hold (`reserved`) can only be lent to the employee they are held
+for, and returning a book hands it to the head of its reservation queue in
+the same transaction (see reservations.py).
+
+The batch variants apply the same UPDATE to a whole list of book IDs with
+`IN (...)` and insert the loans with one executemany, reporting per-book
+success or failure.
+"""
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import exists, insert, select, update
+
+from . import reservations
+from .models import Book, BookStatus, Employee, Loan
+
+async def checkout_book(db, book_id: int, employee_id: int, due_date: datetime) -> Optional[Loan]:
+    """Lend a book to an employee; returns the new Loan, or None if the
+    book is not available to them or the employee does not exist."""
+    now = datetime.utcnow()
+    employee_name = select(Employee.name).where(Employee.id == employee_id).scalar_subquery()
+    result = await db.execute(
+        update(Book)
+        .where(
+            Book.id == book_id,
+            reservations.lendable_to(employee_id),
+            exists().where(Employee.id == employee_id)
+        )
+        .values(
+            status=BookStatus.borrowed,
+            borrower=employee_name,  # Keep for backward compatibility
+            borrower_employee_id=employee_id,
+            due_date=due_date,
+            updated_at=now
+        )
+        .returning(Book.borrower)
+        .execution_options(synchronize_session=False)
+    )
+    row = result.first()
+    if row is None:
+        await db.rollback()
+        return None
+
+    loan = Loan(
+        book_id=book_id,
+        employee_id=employee_id,
+        borrower=row.borrower,  # Keep for backward compatibility
+        checkout_at=now,
+        due_date=due_date
+    )
+    db.add(loan)
+    await db.execute(reservations.fulfil([book_id], employee_id))
+    await db.commit()
+    return loan
+
+async def return_book(db, book_id: int) -> bool:
+    """Mark a lent book as returned and hold it for the next reservation;
+    returns False if it was not on loan."""
+    now = datetime.utcnow()
+    result = await db.execute(
+        update(Book)
+        .where(Book.id == book_id, Book.status == BookStatus.borrowed)
+        .values(
+            status=BookStatus.available,
+            borrower=None,
+            borrower_employee_id=None,
+            due_date=None,
+            updated_at=now
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        await db.rollback()
+        return False
+
+    await db.execute(
+        update(Loan)
+        .where(Loan.book_id == book_id, Loan.returned_at.is_(None))
+        .values(returned_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    await db.run_sync(reservations.hand_off, [book_id], now)
+    await db.commit()
+    return True
+
+async def _failure_reasons(db, book_ids):
+    """Explain why books were not updated: missing vs. in the wrong state"""
+    if not book_ids:
+        return {}
+    existing = set((await db.scalars(select(Book.id).where(Book.id.in_(book_ids)))).all())
+    return {book_id: "not_available" if book_id in existing else "not_found" for book_id in book_ids}
+
+def _batch_result(book_ids, succeeded, failures):
+    return {
+        "succeeded": len(succeeded),
+        "failed": len(failures),
+        "results": [
+            {"book_id": book_id, "ok": book_id in succeeded, "error": failures.get(book_id)}
+            for book_id in book_ids
+        ]
+    }
+
+async def checkout_books(db, book_ids, employee_id: int, due_date: datetime) -> dict:
+    """Lend many books to one employee in a single transaction"""
+    book_ids = list(dict.fromkeys(book_ids))
+    employee_name = await db.scalar(select(Employee.name).where(Employee.id == employee_id))
+    if employee_name is None:
+        return _batch_result(book_ids, set(), {book_id: "employee_not_found" for book_id in book_ids})
+
+    now = datetime.utcnow()
+    result = await db.execute(
+        update(Book)
+        .where(Book.id.in_(book_ids), reservations.lendable_to(employee_id))
+        .values(
+            status=BookStatus.borrowed,
+            borrower=employee_name,  # Keep for backward compatibility
+            borrower_employee_id=employee_id,
+            due_date=due_date,
+            updated_at=now
+        )
+        .returning(Book.id)
+        .execution_options(synchronize_session=False)
+    )
+    succeeded = set(result.scalars().all())
+
+    if succeeded:
+        await db.execute(insert(Loan), [
+            {
+                "book_id": book_id,
+                "employee_id": employee_id,
+                "borrower": employee_name,
+                "checkout_at": now,
+                "due_date": due_date,
+                "is_overdue": False
+            }
+            for book_id in book_ids if book_id in succeeded
+        ])
+        await db.execute(reservations.fulfil(succeeded, employee_id))
+
+    failures = await _failure_reasons(db, [b for b in book_ids if b not in succeeded])
+    await db.commit()
+    return _batch_result(book_ids, succeeded, failures)
+
+async def return_books(db, book_ids) -> dict:
+    """Return many books in a single transaction, holding each for its next reservation"""
+    book_ids = list(dict.fromkeys(book_ids))
+    now = datetime.utcnow()
+    result = await db.execute(
+        update(Book)
+        .where(Book.id.in_(book_ids), Book.status == BookStatus.borrowed)
+        .values(
+            status=BookStatus.available,
+            borrower=None,
+            borrower_employee_id=None,
+            due_date=None,
+            updated_at=now
+        )
+        .returning(Book.id)
+        .execution_options(synchronize_session=False)
+    )
+    succeeded = set(result.scalars().all())
+
+    if succeeded:
+        await db.execute(
+            update(Loan)
+            .where(Loan.book_id.in_(succeeded), Loan.returned_at.is_(None))
+            .values(returned_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        await db.run_sync(reservations.hand_off, succeeded, now)
+
+    failures = await _failure_reasons(db, [b for b in book_ids if b not in succeeded])
+    await db.commit()
+    return _batch_result(book_ids, succeeded, failures)
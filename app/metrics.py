@@ -0,0 +1,86 @@
+"""Prometheus metrics served at /metrics.
+
+Request latency and in-flight requests are recorded by the instrumentation
+middleware, pool gauges by pool checkout/checkin events, and the domain
+counters directly by the handlers and jobs that change state. Nothing here
+queries the database.
+
+With several uvicorn workers set PROMETHEUS_MULTIPROC_DIR to an empty
+directory (cleared on each deploy): prometheus_client then keeps every
+worker's values in memory-mapped files and /metrics aggregates them, with
+gauges summed over live workers.
+"""
+import os
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest, multiprocess
+)
+from sqlalchemy import event
+
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Request latency by route",
+    ["method", "route"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+REQUESTS = Counter("http_requests_total", "Requests by route and status", ["method", "route", "status"])
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "Requests currently being handled", ["method"], multiprocess_mode="livesum"
+)
+
+# Labelled by engine: "sync" (SessionLocal) and "async" (AsyncSessionLocal)
+POOL_SIZE = Gauge("db_pool_size", "Configured pool size", ["engine"], multiprocess_mode="livesum")
+POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out", "Connections checked out of the pool", ["engine"], multiprocess_mode="livesum"
+)
+POOL_OVERFLOW = Gauge(
+    "db_pool_overflow", "Connections open beyond the pool size", ["engine"], multiprocess_mode="livesum"
+)
+
+CHECKOUTS = Counter("library_checkouts_total", "Books lent")
+RETURNS = Counter("library_returns_total", "Books returned")
+RESERVATIONS_CREATED = Counter("library_reservations_created_total", "Reservations created")
+RESERVATIONS_CANCELLED = Counter("library_reservations_cancelled_total", "Reservations cancelled")
+RESERVATION_HOLDS = Counter("library_reservation_holds_total", "Returned books held for the next reservation")
+RESERVATION_HOLDS_EXPIRED = Counter("library_reservation_holds_expired_total", "Holds cancelled after expiring")
+LOANS_MARKED_OVERDUE = Counter("library_loans_marked_overdue_total", "Loans flagged overdue by the sweeper")
+
+def observe_request(method, route, status, seconds):
+    REQUEST_LATENCY.labels(method, route).observe(seconds)
+    REQUESTS.labels(method, route, str(status)).inc()
+
+def instrument_pool(engine, name):
+    """Keep the pool gauges for the sync `engine` current from checkout/checkin events"""
+    pool = engine.pool
+    if not hasattr(pool, "checkedout"):
+        return
+    POOL_SIZE.labels(name).set(pool.size())
+    checked_out = POOL_CHECKED_OUT.labels(name)
+    overflow = POOL_OVERFLOW.labels(name)
+
+    # The pool's own counter is only updated after the checkin event fires
+    def on_checkout(*args):
+        checked_out.inc()
+        overflow.set(max(pool.overflow(), 0))
+
+    def on_checkin(*args):
+        checked_out.dec()
+        overflow.set(max(pool.overflow(), 0))
+
+    event.listen(engine, "checkout", on_checkout)
+    event.listen(engine, "checkin", on_checkin)
+
+def render_metrics():
+    """(body, content type) for the /metrics response"""
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+def mark_process_dead():
+    """Drop this worker's live gauges from the multiprocess aggregate"""
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
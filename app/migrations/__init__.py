@@ -0,0 +1,99 @@
+"""Versioned schema migrations.
+
+Each revision is a module in this package named ``vNNNN_<slug>.py`` that
+defines ``revision``, ``down_revision``, ``upgrade(conn)`` and
+``downgrade(conn)``, in the style of Alembic. Revisions form a single linear
+chain; applied revisions are recorded in the ``schema_migrations`` table and
+each one runs in its own transaction.
+
+Run them with ``python migrate_schema.py upgrade``.
+"""
+import importlib
+import pkgutil
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table, delete, insert, select
+
+schema_migrations = Table(
+    "schema_migrations", MetaData(),
+    Column("revision", String, primary_key=True),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+def load_revisions():
+    """Return the revision modules in chain order, oldest first"""
+    modules = [
+        importlib.import_module(f"{__name__}.{info.name}")
+        for info in sorted(pkgutil.iter_modules(__path__), key=lambda info: info.name)
+        if info.name.startswith("v")
+    ]
+    previous = None
+    for module in modules:
+        if module.down_revision != previous:
+            raise RuntimeError(
+                f"Migration {module.__name__} follows {module.down_revision!r}, expected {previous!r}"
+            )
+        previous = module.revision
+    return modules
+
+def applied_revisions(conn):
+    schema_migrations.create(conn, checkfirst=True)
+    return set(conn.execute(select(schema_migrations.c.revision)).scalars())
+
+def current_revision(engine):
+    """The newest applied revision, or None for an empty database"""
+    with engine.begin() as conn:
+        applied = applied_revisions(conn)
+    current = None
+    for module in load_revisions():
+        if module.revision in applied:
+            current = module.revision
+    return current
+
+def pending_revisions(engine):
+    with engine.begin() as conn:
+        applied = applied_revisions(conn)
+    return [module for module in load_revisions() if module.revision not in applied]
+
+def upgrade(engine, target=None):
+    """Apply pending revisions up to and including `target` (default: all)"""
+    modules = load_revisions()
+    if target is not None:
+        revisions = [module.revision for module in modules]
+        if target not in revisions:
+            raise ValueError(f"Unknown revision {target!r}")
+        # Nothing past the target, even if the target itself is already applied
+        modules = modules[:revisions.index(target) + 1]
+    with engine.begin() as conn:
+        already = applied_revisions(conn)
+
+    applied = []
+    for module in modules:
+        if module.revision in already:
+            continue
+        with engine.begin() as conn:
+            module.upgrade(conn)
+            conn.execute(insert(schema_migrations).values(revision=module.revision, applied_at=datetime.utcnow()))
+        applied.append(module.revision)
+    return applied
+
+def downgrade(engine, target):
+    """Revert applied revisions newer than `target` ("base" reverts all)"""
+    with engine.begin() as conn:
+        applied = applied_revisions(conn)
+    modules = load_revisions()
+    revisions = [module.revision for module in modules]
+    if target != "base" and target not in revisions:
+        raise ValueError(f"Unknown revision {target!r}")
+
+    reverted = []
+    for module in reversed(modules):
+        if module.revision == target:
+            break
+        if module.revision not in applied:
+            continue
+        with engine.begin() as conn:
+            module.downgrade(conn)
+            conn.execute(delete(schema_migrations).where(schema_migrations.c.revision == module.revision))
+        reverted.append(module.revision)
+    return reverted
@@ -0,0 +1,96 @@
+"""Initial schema: the tables created by create_all before migrations existed.
+
+Databases created by earlier releases already have these tables, so this
+only creates what is missing. The tables are pinned here as they were at
+that point rather than taken from the live models: every later index or
+column must come from its own revision, which then applies to old and new
+databases alike.
+"""
+from sqlalchemy import Boolean, Column, DateTime, Enum, ForeignKey, Integer, MetaData, String, Table, Text
+
+revision = "0001"
+down_revision = None
+
+metadata = MetaData()
+
+Table(
+    "employees", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("employee_id", String, nullable=False, unique=True, index=True),
+    Column("name", String, nullable=False, index=True),
+    Column("name_kana", String, nullable=True, index=True),
+    Column("email", String, nullable=True, unique=True, index=True),
+    Column("department", String, nullable=True, index=True),
+    Column("position", String, nullable=True),
+    Column("phone", String, nullable=True),
+    Column("hire_date", DateTime, nullable=True),
+    Column("status", Enum("active", "inactive", "retired", name="employeestatus"), nullable=False),
+    Column("notes", Text, nullable=True),
+    Column("created_at", DateTime, nullable=False),
+    Column("updated_at", DateTime, nullable=False),
+)
+
+Table(
+    "genres", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("name", String, nullable=False, unique=True, index=True),
+    Column("parent_id", Integer, ForeignKey("genres.id"), nullable=True),
+    Column("level", Integer, nullable=False),
+    Column("description", String, nullable=True),
+    Column("created_at", DateTime, nullable=False),
+    Column("updated_at", DateTime, nullable=False),
+)
+
+Table(
+    "books", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("title", String, nullable=False, index=True),
+    Column("author", String, nullable=False, index=True),
+    Column("description", Text, nullable=True),
+    Column("genre_id", Integer, ForeignKey("genres.id"), nullable=True),
+    Column("genre", String, nullable=True, index=True),
+    Column("isbn", String, nullable=True, index=True),
+    Column("publisher", String, nullable=True),
+    Column("publication_year", Integer, nullable=True),
+    Column("pages", Integer, nullable=True),
+    Column("status", Enum("available", "borrowed", "reserved", name="bookstatus"), nullable=False),
+    Column("borrower", String, nullable=True),
+    Column("borrower_employee_id", Integer, ForeignKey("employees.id"), nullable=True),
+    Column("due_date", DateTime, nullable=True),
+    Column("created_at", DateTime, nullable=False),
+    Column("updated_at", DateTime, nullable=False),
+)
+
+Table(
+    "loans", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("book_id", Integer, ForeignKey("books.id"), nullable=False),
+    Column("employee_id", Integer, ForeignKey("employees.id"), nullable=False),
+    Column("borrower", String, nullable=False),
+    Column("checkout_at", DateTime, nullable=False),
+    Column("due_date", DateTime, nullable=False),
+    Column("returned_at", DateTime, nullable=True),
+    Column("is_overdue", Boolean, nullable=False),
+)
+
+Table(
+    "reservations", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("book_id", Integer, ForeignKey("books.id"), nullable=False),
+    Column("employee_id", Integer, ForeignKey("employees.id"), nullable=False),
+    Column("reserver", String, nullable=False),
+    Column("status", Enum("active", "completed", "cancelled", name="reservationstatus"), nullable=False),
+    Column("reserved_at", DateTime, nullable=False),
+    Column("notified_at", DateTime, nullable=True),
+    Column("expires_at", DateTime, nullable=True),
+)
+
+TABLES = ["employees", "genres", "books", "loans", "reservations"]
+
+def upgrade(conn):
+    for name in TABLES:
+        metadata.tables[name].create(conn, checkfirst=True)
+
+def downgrade(conn):
+    for name in reversed(TABLES):
+        metadata.tables[name].drop(conn, checkfirst=True)
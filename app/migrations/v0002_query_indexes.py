@@ -0,0 +1,61 @@
+"""Composite and partial indexes for the loan, overdue, reservation and
+book list queries in the routers.
+
+The indexes are pinned here, on just the columns they cover, rather than
+read from the live models, so this revision keeps creating and dropping the
+same indexes whatever later revisions change.
+"""
+from sqlalchemy import Column, DateTime, Index, Integer, MetaData, String, Table
+from sqlalchemy.schema import CreateIndex, DropIndex
+
+revision = "0002"
+down_revision = "0001"
+
+metadata = MetaData()
+
+books = Table(
+    "books", metadata,
+    Column("status", String),
+    Column("borrower_employee_id", Integer),
+)
+
+loans = Table(
+    "loans", metadata,
+    Column("book_id", Integer),
+    Column("employee_id", Integer),
+    Column("checkout_at", DateTime),
+    Column("due_date", DateTime),
+    Column("returned_at", DateTime),
+)
+
+reservations = Table(
+    "reservations", metadata,
+    Column("book_id", Integer),
+    Column("employee_id", Integer),
+    Column("status", String),
+    Column("reserved_at", DateTime),
+)
+
+open_loan = loans.c.returned_at.is_(None)
+
+INDEXES = [
+    Index("ix_books_status", books.c.status),
+    Index("ix_books_borrower_employee_id", books.c.borrower_employee_id),
+    Index("ix_loans_book_id_checkout_at", loans.c.book_id, loans.c.checkout_at.desc()),
+    Index("ix_loans_employee_id_checkout_at", loans.c.employee_id, loans.c.checkout_at.desc()),
+    Index("ix_loans_checkout_at", loans.c.checkout_at.desc()),
+    Index("ix_loans_open_due_date", loans.c.due_date, sqlite_where=open_loan, postgresql_where=open_loan),
+    Index("ix_loans_open_book_id", loans.c.book_id, sqlite_where=open_loan, postgresql_where=open_loan),
+    Index("ix_reservations_status_reserved_at", reservations.c.status, reservations.c.reserved_at),
+    Index("ix_reservations_book_id_status_reserved_at",
+          reservations.c.book_id, reservations.c.status, reservations.c.reserved_at),
+    Index("ix_reservations_employee_id_status", reservations.c.employee_id, reservations.c.status),
+]
+
+def upgrade(conn):
+    for index in INDEXES:
+        conn.execute(CreateIndex(index, if_not_exists=True))
+
+def downgrade(conn):
+    for index in INDEXES:
+        conn.execute(DropIndex(index, if_exists=True))
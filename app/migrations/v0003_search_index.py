@@ -0,0 +1,13 @@
+"""Full-text search index on books (FTS5 on SQLite, pg_trgm on PostgreSQL),
+previously created by setup_search() at app startup.
+"""
+from ..search import create_search_index, drop_search_index
+
+revision = "0003"
+down_revision = "0002"
+
+def upgrade(conn):
+    create_search_index(conn)
+
+def downgrade(conn):
+    drop_search_index(conn)
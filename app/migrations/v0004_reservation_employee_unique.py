@@ -0,0 +1,49 @@
+"""Unique partial index on active reservations per (book_id, employee_id).
+
+Reservations used to be deduplicated by comparing the free-text reserver, so
+an employee may already hold several active reservations for one book. All
+but the oldest are cancelled before the index is built.
+"""
+import logging
+
+from sqlalchemy import Column, Index, Integer, MetaData, String, Table, func, select, update
+from sqlalchemy.schema import CreateIndex, DropIndex
+
+logger = logging.getLogger(__name__)
+
+revision = "0004"
+down_revision = "0003"
+
+metadata = MetaData()
+
+reservations = Table(
+    "reservations", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("book_id", Integer),
+    Column("employee_id", Integer),
+    Column("status", String),
+)
+
+ACTIVE = reservations.c.status == "active"
+
+INDEX = Index(
+    "ux_reservations_active_book_employee", reservations.c.book_id, reservations.c.employee_id,
+    unique=True, sqlite_where=ACTIVE, postgresql_where=ACTIVE,
+)
+
+def upgrade(conn):
+    keep = (
+        select(func.min(reservations.c.id)).where(ACTIVE)
+        .group_by(reservations.c.book_id, reservations.c.employee_id)
+    )
+    result = conn.execute(
+        update(reservations)
+        .where(ACTIVE, reservations.c.employee_id.isnot(None), reservations.c.id.not_in(keep))
+        .values(status="cancelled")
+    )
+    if result.rowcount:
+        logger.warning("Cancelled %d duplicate active reservations", result.rowcount)
+    conn.execute(CreateIndex(INDEX, if_not_exists=True))
+
+def downgrade(conn):
+    conn.execute(DropIndex(INDEX, if_exists=True))
@@ -0,0 +1,22 @@
+"""(status, expires_at) index for the hold expiry sweep."""
+from sqlalchemy import Column, DateTime, Index, MetaData, String, Table
+from sqlalchemy.schema import CreateIndex, DropIndex
+
+revision = "0005"
+down_revision = "0004"
+
+metadata = MetaData()
+
+reservations = Table(
+    "reservations", metadata,
+    Column("status", String),
+    Column("expires_at", DateTime),
+)
+
+INDEX = Index("ix_reservations_status_expires_at", reservations.c.status, reservations.c.expires_at)
+
+def upgrade(conn):
+    conn.execute(CreateIndex(INDEX, if_not_exists=True))
+
+def downgrade(conn):
+    conn.execute(DropIndex(INDEX, if_exists=True))
@@ -0,0 +1,26 @@
+"""(created_at, id) index for /books keyset pagination.
+
+It was added to the Book model together with the pagination, but no
+revision created it, so databases that predate the migrations never got it.
+"""
+from sqlalchemy import Column, DateTime, Index, Integer, MetaData, Table
+from sqlalchemy.schema import CreateIndex, DropIndex
+
+revision = "0006"
+down_revision = "0005"
+
+metadata = MetaData()
+
+books = Table(
+    "books", metadata,
+    Column("id", Integer),
+    Column("created_at", DateTime),
+)
+
+INDEX = Index("ix_books_created_at_id", books.c.created_at, books.c.id)
+
+def upgrade(conn):
+    conn.execute(CreateIndex(INDEX, if_not_exists=True))
+
+def downgrade(conn):
+    conn.execute(DropIndex(INDEX, if_exists=True))
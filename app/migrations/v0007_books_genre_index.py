@@ -0,0 +1,23 @@
+"""(genre_id, created_at, id) index for genre matches in book search."""
+from sqlalchemy import Column, DateTime, Index, Integer, MetaData, Table
+from sqlalchemy.schema import CreateIndex, DropIndex
+
+revision = "0007"
+down_revision = "0006"
+
+metadata = MetaData()
+
+books = Table(
+    "books", metadata,
+    Column("id", Integer),
+    Column("genre_id", Integer),
+    Column("created_at", DateTime),
+)
+
+INDEX = Index("ix_books_genre_id_created_at_id", books.c.genre_id, books.c.created_at, books.c.id)
+
+def upgrade(conn):
+    conn.execute(CreateIndex(INDEX, if_not_exists=True))
+
+def downgrade(conn):
+    conn.execute(DropIndex(INDEX, if_exists=True))
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Enum, ForeignKey, Boolean, Text
+from sqlalchemy import Column, Integer, String, DateTime, Enum, ForeignKey, Boolean, Text, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -80,6 +80,16 @@ class Book(Base):
     loans = relationship("Loan", back_populates="book")
     reservations = relationship("Reservation", back_populates="book")
 
+    __table_args__ = (
+        # Keyset pagination order for /books (also serves created_at DESC scans)
+        Index("ix_books_created_at_id", "created_at", "id"),
+        # Status filter on /books and the dashboard counts
+        Index("ix_books_status", "status"),
+        Index("ix_books_borrower_employee_id", "borrower_employee_id"),
+        # Genre matches in search, newest first
+        Index("ix_books_genre_id_created_at_id", "genre_id", "created_at", "id"),
+    )
+
 class Loan(Base):
     __tablename__ = "loans"
 
@@ -95,6 +105,19 @@ class Loan(Base):
     book = relationship("Book", back_populates="loans")
     employee = relationship("Employee", back_populates="loans")
 
+    __table_args__ = (
+        # Loan history on book_detail / employee_detail, newest first
+        Index("ix_loans_book_id_checkout_at", book_id, checkout_at.desc()),
+        Index("ix_loans_employee_id_checkout_at", employee_id, checkout_at.desc()),
+        # /loans history
+        Index("ix_loans_checkout_at", checkout_at.desc()),
+        # Open loans only: /overdue, the overdue sweep, and return's loan close
+        Index("ix_loans_open_due_date", due_date,
+              sqlite_where=returned_at.is_(None), postgresql_where=returned_at.is_(None)),
+        Index("ix_loans_open_book_id", book_id,
+              sqlite_where=returned_at.is_(None), postgresql_where=returned_at.is_(None)),
+    )
+
 class Reservation(Base):
     __tablename__ = "reservations"
 
@@ -108,4 +131,18 @@ class Reservation(Base):
     expires_at = Column(DateTime, nullable=True)
 
     book = relationship("Book", back_populates="reservations")
-    employee = relationship("Employee", back_populates="reservations")
\ No newline at end of file
+    employee = relationship("Employee", back_populates="reservations")
+
+    __table_args__ = (
+        # /reservations queue, oldest first
+        Index("ix_reservations_status_reserved_at", status, reserved_at),
+        # Per-book queue on book_detail and the duplicate check in reserve
+        Index("ix_reservations_book_id_status_reserved_at", book_id, status, reserved_at),
+        Index("ix_reservations_employee_id_status", employee_id, status),
+        # One active reservation per employee and book; reserve's duplicate check
+        Index("ux_reservations_active_book_employee", book_id, employee_id, unique=True,
+              sqlite_where=status == ReservationStatus.active,
+              postgresql_where=status == ReservationStatus.active),
+        # Hold expiry sweep
+        Index("ix_reservations_status_expires_at", status, expires_at),
+    )
\ No newline at end of file
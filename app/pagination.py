@@ -0,0 +1,113 @@
+import base64
+import json
+import os
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, List, Optional
+from urllib.parse import urlencode
+
+from sqlalchemy import and_, or_
+
+# Page size settings (overridable from environment)
+DEFAULT_PAGE_SIZE = int(os.getenv("PAGE_SIZE", "50"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "200"))
+
+@dataclass
+class Page:
+    items: List[Any] = field(default_factory=list)
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+    limit: int = DEFAULT_PAGE_SIZE
+
+def clamp_page_size(limit: Optional[int]) -> int:
+    """Clamp a requested page size to 1..MAX_PAGE_SIZE"""
+    if not limit or limit < 1:
+        return DEFAULT_PAGE_SIZE
+    return min(limit, MAX_PAGE_SIZE)
+
+def encode_cursor(sort_value, row_id: int) -> str:
+    """Encode a (sort value, id) pair as an opaque URL-safe cursor"""
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([sort_value, row_id], ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: Optional[str], sort_column):
+    """Decode a cursor back into a (sort value, id) pair, or None if invalid"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        if sort_column.type.python_type is datetime:
+            sort_value = datetime.fromisoformat(sort_value)
+        return sort_value, int(row_id)
+    except (ValueError, TypeError, NotImplementedError):
+        return None
+
+def keyset_paginate(
+    query,
+    sort_column,
+    id_column,
+    after: Optional[str] = None,
+    before: Optional[str] = None,
+    limit: Optional[int] = None,
+    descending: bool = False,
+) -> Page:
+    """Fetch one page of `query` ordered by (sort_column, id_column).
+
+    `after` continues past the last row of the previous page and `before`
+    walks back from the first row of the current one. Only `limit + 1` rows
+    are read, so the cost does not depend on how deep the page is.
+    """
+    limit = clamp_page_size(limit)
+    after_key = decode_cursor(after, sort_column)
+    before_key = decode_cursor(before, sort_column) if after_key is None else None
+    backwards = before_key is not None
+
+    def seek(key, forward):
+        value, row_id = key
+        # "forward" means further along the listing order
+        if forward != descending:
+            return or_(sort_column > value, and_(sort_column == value, id_column > row_id))
+        return or_(sort_column < value, and_(sort_column == value, id_column < row_id))
+
+    if after_key is not None:
+        query = query.filter(seek(after_key, True))
+    elif backwards:
+        query = query.filter(seek(before_key, False))
+
+    # Reverse the scan direction when paging backwards, then flip the rows
+    scan_desc = descending != backwards
+    if scan_desc:
+        query = query.order_by(sort_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(sort_column.asc(), id_column.asc())
+
+    rows = query.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if backwards:
+        rows.reverse()
+
+    def cursor_for(row):
+        return encode_cursor(getattr(row, sort_column.key), getattr(row, id_column.key))
+
+    page = Page(items=rows, limit=limit)
+    if rows:
+        if backwards:
+            page.next_cursor = cursor_for(rows[-1])
+            page.prev_cursor = cursor_for(rows[0]) if has_more else None
+        else:
+            page.next_cursor = cursor_for(rows[-1]) if has_more else None
+            page.prev_cursor = cursor_for(rows[0]) if after_key is not None else None
+    return page
+
+def page_url(request, **params) -> Optional[str]:
+    """Build a relative URL for another page, keeping the current filters"""
+    query = {k: v for k, v in request.query_params.items() if k not in ("after", "before")}
+    for key, value in params.items():
+        if value is None:
+            return None
+        query[key] = value
+    return f"{request.url.path}?{urlencode(query)}"
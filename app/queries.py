@@ -0,0 +1,140 @@
+"""Query helpers with the eager-loading each page needs.
+
+Templates for the loan, overdue and reservation pages read `loan.book` /
+`reservation.book` on every row. Building those queries here with the
+related rows joined in keeps each page at a fixed number of statements
+instead of one lazy SELECT per row.
+"""
+from contextlib import contextmanager
+
+from sqlalchemy import event, func, select, text
+from sqlalchemy.orm import joinedload
+
+from .models import Book, BookStatus, Genre, Loan, Reservation, ReservationStatus
+
+# Maximum SQL statements each page may issue for a render; benchmark.py
+# fails the run when a page goes over
+QUERY_BUDGETS = {
+    "/": 4,
+    "/books": 2,
+    "/books/{book_id}": 3,
+    "/loans": 1,
+    "/overdue": 1,
+    "/reservations": 1,
+    "/genres": 1,
+    "/employees/{employee_id}": 6,
+}
+
+class QueryPlanRegression(AssertionError):
+    pass
+
+# Loader options, shared by sync Query helpers and async select() statements.
+# The genre breadcrumb on book_detail walks up to two parents.
+BOOK_DETAIL_LOAD = joinedload(Book.genre_obj).joinedload(Genre.parent).joinedload(Genre.parent)
+LOAN_BOOK_LOAD = joinedload(Loan.book)
+RESERVATION_BOOK_LOAD = joinedload(Reservation.book)
+
+def loans_with_book(db):
+    return db.query(Loan).options(LOAN_BOOK_LOAD)
+
+def reservations_with_book(db):
+    return db.query(Reservation).options(RESERVATION_BOOK_LOAD)
+
+@contextmanager
+def count_queries(engine):
+    """Collect every SQL statement executed on `engine` inside the block"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+# Router queries and the index each one must be planned with
+PLAN_CHECKS = {
+    "book_detail loans": (
+        select(Loan).where(Loan.book_id == 1).order_by(Loan.checkout_at.desc()),
+        "ix_loans_book_id_checkout_at",
+    ),
+    "book_detail reservations": (
+        select(Reservation).where(Reservation.book_id == 1, Reservation.status == ReservationStatus.active)
+        .order_by(Reservation.reserved_at.asc()),
+        "ix_reservations_book_id_status_reserved_at",
+    ),
+    "reserve duplicate check": (
+        select(Reservation.id).where(
+            Reservation.book_id == 1, Reservation.employee_id == 1, Reservation.status == ReservationStatus.active
+        ),
+        "ux_reservations_active_book_employee",
+    ),
+    "reservation hold expiry": (
+        select(Reservation.book_id).where(
+            Reservation.status == ReservationStatus.active, Reservation.expires_at < func.current_timestamp()
+        ),
+        "ix_reservations_status_expires_at",
+    ),
+    "reservation queue position": (
+        select(func.count(Reservation.id)).where(
+            Reservation.book_id == 1, Reservation.status == ReservationStatus.active,
+            Reservation.reserved_at < func.current_timestamp()
+        ),
+        "ix_reservations_book_id_status_reserved_at",
+    ),
+    "employee_detail loans": (
+        select(Loan).where(Loan.employee_id == 1, Loan.returned_at.isnot(None))
+        .order_by(Loan.checkout_at.desc(), Loan.id.desc()).limit(50),
+        "ix_loans_employee_id_checkout_at",
+    ),
+    "employee_detail reservations": (
+        select(Reservation).where(Reservation.employee_id == 1, Reservation.status == ReservationStatus.active),
+        "ix_reservations_employee_id_status",
+    ),
+    "/loans": (
+        select(Loan).order_by(Loan.checkout_at.desc()).limit(100),
+        "ix_loans_checkout_at",
+    ),
+    "/overdue": (
+        select(Loan).where(Loan.returned_at.is_(None), Loan.due_date < func.current_timestamp())
+        .order_by(Loan.due_date.asc()),
+        "ix_loans_open_due_date",
+    ),
+    "/reservations": (
+        select(Reservation).where(Reservation.status == ReservationStatus.active)
+        .order_by(Reservation.reserved_at.asc()),
+        "ix_reservations_status_reserved_at",
+    ),
+    "/books?status=": (
+        select(Book).where(Book.status == BookStatus.borrowed),
+        "ix_books_status",
+    ),
+    "/books": (
+        select(Book).order_by(Book.created_at.desc(), Book.id.desc()).limit(50),
+        "ix_books_created_at_id",
+    ),
+}
+
+def explain(conn, statement) -> str:
+    """Return the backend's query plan for `statement` as text"""
+    sql = str(statement.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True}))
+    if conn.dialect.name == "sqlite":
+        return "\n".join(row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")))
+    return "\n".join(row[0] for row in conn.execute(text(f"EXPLAIN {sql}")))
+
+def check_query_plans(engine):
+    """Raise QueryPlanRegression if a PLAN_CHECKS query stops using its index"""
+    failures = []
+    with engine.connect() as conn:
+        if conn.dialect.name == "postgresql":
+            # Small tables are cheaper to scan; ask whether the index is usable
+            conn.execute(text("SET LOCAL enable_seqscan = off"))
+        for label, (statement, index_name) in PLAN_CHECKS.items():
+            plan = explain(conn, statement)
+            if index_name not in plan:
+                failures.append(f"{label}: expected {index_name}\n{plan}")
+        conn.rollback()
+    if failures:
+        raise QueryPlanRegression("\n\n".join(failures))
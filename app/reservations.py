@@ -0,0 +1,172 @@
+"""Reservation queue: hand-off on return, hold expiry and queue positions.
+
+A book's active reservations form a FIFO queue ordered by (reserved_at, id)
+and read through ix_reservations_book_id_status_reserved_at. When the book
+comes back and someone is waiting, the head of the queue gets a hold in the
+same transaction as the return: the book moves to `reserved` instead of
+`available` and the reservation gets notified_at / expires_at. A held
+reservation is an active one with notified_at set. Only its employee can
+check the book out, which completes the reservation.
+
+Holds not picked up within RESERVATION_HOLD_HOURS are cancelled in bulk by
+the sweeper in jobs.py. The book then passes to the next in line, or goes
+back to `available` when nobody is waiting.
+
+The functions take a sync Session; the async loan operations call them
+through AsyncSession.run_sync, so they share the caller's transaction.
+"""
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import and_, exists, func, or_, select, update
+from sqlalchemy.orm import aliased
+
+from .metrics import RESERVATION_HOLDS, RESERVATION_HOLDS_EXPIRED
+from .models import Book, BookStatus, Reservation, ReservationStatus
+
+RESERVATION_HOLD_HOURS = float(os.getenv("RESERVATION_HOLD_HOURS", "72"))
+
+ACTIVE = Reservation.status == ReservationStatus.active
+
+def held_for(employee_id):
+    """Clause for UPDATE books: the book is held for `employee_id`"""
+    return exists().where(
+        Reservation.book_id == Book.id,
+        Reservation.employee_id == employee_id,
+        ACTIVE,
+        Reservation.notified_at.isnot(None)
+    )
+
+def lendable_to(employee_id):
+    """Clause for UPDATE books: available, or held for `employee_id`"""
+    return or_(
+        Book.status == BookStatus.available,
+        and_(Book.status == BookStatus.reserved, held_for(employee_id))
+    )
+
+def fulfil(book_ids: Iterable[int], employee_id: int):
+    """UPDATE completing the employee's reservations for books just lent to them"""
+    return (
+        update(Reservation)
+        .where(Reservation.book_id.in_(list(book_ids)), Reservation.employee_id == employee_id, ACTIVE)
+        .values(status=ReservationStatus.completed)
+        .execution_options(synchronize_session=False)
+    )
+
+def queue_heads(db, book_ids) -> Dict[int, int]:
+    """book_id -> id of the first waiting (active, not yet notified) reservation"""
+    place = func.row_number().over(
+        partition_by=Reservation.book_id, order_by=(Reservation.reserved_at, Reservation.id)
+    ).label("place")
+    waiting = select(Reservation.id, Reservation.book_id, place).where(
+        Reservation.book_id.in_(list(book_ids)), ACTIVE, Reservation.notified_at.is_(None)
+    ).subquery()
+    return dict(db.execute(select(waiting.c.book_id, waiting.c.id).where(waiting.c.place == 1)).all())
+
+def hand_off(db, book_ids, now=None) -> Dict[int, int]:
+    """Put each of `book_ids` on hold for the head of its queue.
+
+    Books with someone waiting move to `reserved`; the others are left as
+    they are. Returns book_id -> reservation id of the new holds. Does not
+    commit."""
+    book_ids = list(book_ids)
+    if not book_ids:
+        return {}
+    heads = queue_heads(db, book_ids)
+    if not heads:
+        return {}
+
+    now = now or datetime.utcnow()
+    # Re-check the heads in the UPDATE: one may have been cancelled or put on
+    # hold by a concurrent request since queue_heads read it. Only the books
+    # whose hold was actually set are reserved.
+    held = dict(db.execute(
+        update(Reservation)
+        .where(Reservation.id.in_(list(heads.values())), ACTIVE, Reservation.notified_at.is_(None))
+        .values(notified_at=now, expires_at=now + timedelta(hours=RESERVATION_HOLD_HOURS))
+        .returning(Reservation.book_id, Reservation.id)
+        .execution_options(synchronize_session=False)
+    ).all())
+    if not held:
+        return {}
+    db.execute(
+        update(Book)
+        .where(Book.id.in_(list(held)))
+        .values(status=BookStatus.reserved, updated_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    RESERVATION_HOLDS.inc(len(held))
+    return held
+
+def _release(db, book_ids, now):
+    """Pass held books on to the next in line, or make them available"""
+    held = db.scalars(
+        select(Book.id).where(Book.id.in_(list(book_ids)), Book.status == BookStatus.reserved)
+    ).all()
+    handed = hand_off(db, held, now)
+    rest = [book_id for book_id in held if book_id not in handed]
+    if rest:
+        db.execute(
+            update(Book)
+            .where(Book.id.in_(rest), Book.status == BookStatus.reserved)
+            .values(status=BookStatus.available, updated_at=now)
+            .execution_options(synchronize_session=False)
+        )
+
+def cancel_reservation(db, reservation_id: int) -> Tuple[Optional[Reservation], bool]:
+    """Cancel an active reservation, passing its hold on if it had one.
+
+    Returns (reservation, cancelled). The reservation is None if it does not
+    exist; cancelled is False if it was no longer active (completed or
+    already cancelled), which is left unchanged."""
+    # Conditional UPDATE: a concurrent checkout or cancel cannot be overwritten
+    row = db.execute(
+        update(Reservation)
+        .where(Reservation.id == reservation_id, ACTIVE)
+        .values(status=ReservationStatus.cancelled)
+        .returning(Reservation.book_id, Reservation.notified_at)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if row is not None and row.notified_at is not None:
+        _release(db, [row.book_id], datetime.utcnow())
+    db.commit()
+    return db.get(Reservation, reservation_id), row is not None
+
+def expire_holds(db, now=None) -> int:
+    """Cancel every hold past expires_at and pass the books on; returns the
+    number of holds expired."""
+    now = now or datetime.utcnow()
+    book_ids = db.execute(
+        update(Reservation)
+        .where(ACTIVE, Reservation.expires_at < now)
+        .values(status=ReservationStatus.cancelled)
+        .returning(Reservation.book_id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    if book_ids:
+        _release(db, set(book_ids), now)
+    db.commit()
+    RESERVATION_HOLDS_EXPIRED.inc(len(book_ids))
+    return len(book_ids)
+
+def queue_positions(db, reservation_ids) -> Dict[int, int]:
+    """reservation id -> 1-based place in its book's queue.
+
+    Each place is a COUNT of the active reservations ahead of it, which is a
+    seek into ix_reservations_book_id_status_reserved_at plus a walk over
+    the entries in front, instead of sorting the book's whole queue."""
+    reservation_ids = list(reservation_ids)
+    if not reservation_ids:
+        return {}
+    ahead = aliased(Reservation)
+    in_front = select(func.count(ahead.id)).where(
+        ahead.book_id == Reservation.book_id,
+        ahead.status == ReservationStatus.active,
+        or_(
+            ahead.reserved_at < Reservation.reserved_at,
+            and_(ahead.reserved_at == Reservation.reserved_at, ahead.id < Reservation.id)
+        )
+    ).scalar_subquery()
+    rows = db.execute(select(Reservation.id, in_front + 1).where(Reservation.id.in_(reservation_ids))).all()
+    return dict(rows)
@@ -0,0 +1,38 @@
+from fastapi import APIRouter
+from fastapi.responses import Response
+
+from ..database import async_engine, async_pool_wait_stats, engine, pool_wait_stats
+from ..jobs import hold_job_status, overdue_job_status
+from ..metrics import render_metrics
+
+router = APIRouter()
+
+@router.get("/api/admin/jobs")
+def jobs_status_api():
+    return {"overdue_sweep": overdue_job_status, "hold_sweep": hold_job_status}
+
+def _pool_status(pool, wait_stats):
+    checkouts = wait_stats["checkouts"]
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "status": pool.status(),
+        "wait": {
+            **wait_stats,
+            "avg_wait_ms": wait_stats["total_wait_ms"] / checkouts if checkouts else 0.0
+        }
+    }
+
+@router.get("/api/admin/pool")
+def pool_status_api():
+    # Top level is the sync pool, as before the async engine was added
+    return {
+        **_pool_status(engine.pool, pool_wait_stats),
+        "async": _pool_status(async_engine.pool, async_pool_wait_stats),
+    }
+
+@router.get("/metrics")
+def metrics_endpoint():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
@@ -1,78 +1,55 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, Form
+from fastapi import APIRouter, Depends, HTTPException, Request, Form, File, UploadFile
 from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import or_, select
+from sqlalchemy.exc import IntegrityError
+from dataclasses import asdict
 from datetime import datetime, timedelta
 from typing import Optional
+import io
 
-from ..database import get_db
+from ..database import get_db, get_async_db
+from ..genre_cache import get_genre_tree
+from ..employee_directory import get_employee_index
+from ..queries import BOOK_DETAIL_LOAD, loans_with_book, reservations_with_book
+from ..pagination import keyset_paginate, page_url, clamp_page_size
+from ..search import book_search_clause, search_books
+from ..stats import get_stats, invalidate_stats
 from ..models import Book, Loan, Reservation, BookStatus, ReservationStatus, Genre, Employee, EmployeeStatus
 from .. import schemas
+from .. import loans as loan_service
+from .. import reservations as reservation_queue
+from .. import metrics
+from ..importer import ImportReport, import_books, detect_format, clamp_batch_size, DEFAULT_BATCH_SIZE
 
 def get_genres_for_dropdown(db: Session):
     """Get genres in proper hierarchical order for dropdown display"""
-    def build_dropdown_list(parent_id=None, level=1, prefix=""):
-        genres = db.query(Genre).filter(Genre.parent_id == parent_id).order_by(Genre.name).all()
-        result = []
-        
-        for genre in genres:
-            display_name = f"{prefix}{genre.name}"
-            result.append({
-                "id": genre.id,
-                "name": genre.name,
-                "display_name": display_name,
-                "level": level
-            })
-            
-            # Add children
-            if level < 3:  # Max 3 levels
-                child_prefix = f"{prefix}{genre.name} / " if level < 2 else f"{prefix}{genre.name} / "
-                children = build_dropdown_list(genre.id, level + 1, child_prefix)
-                result.extend(children)
-        
-        return result
-    
-    return build_dropdown_list()
+    return get_genre_tree(db).dropdown()
 
 router = APIRouter()
 templates = Jinja2Templates(directory="templates")
 
 @router.get("/", response_class=HTMLResponse)
-def dashboard(request: Request, db: Session = Depends(get_db)):
-    total_books = db.query(Book).count()
-    available_books = db.query(Book).filter(Book.status == BookStatus.available).count()
-    borrowed_books = db.query(Book).filter(Book.status == BookStatus.borrowed).count()
-    
-    recent_books = db.query(Book).order_by(Book.created_at.desc()).limit(5).all()
+async def dashboard(request: Request, db: AsyncSession = Depends(get_async_db)):
+    stats = await db.run_sync(get_stats)
+    recent_books = (await db.scalars(select(Book).order_by(Book.created_at.desc()).limit(5))).all()
     
     return templates.TemplateResponse("index.html", {
         "request": request,
-        "total_books": total_books,
-        "available_books": available_books,
-        "borrowed_books": borrowed_books,
+        **stats,
         "recent_books": recent_books
     })
 
-@router.get("/books", response_class=HTMLResponse)
-def books_list(
-    request: Request, 
-    q: Optional[str] = None,
-    author: Optional[str] = None,
-    genre: Optional[str] = None,
-    status: Optional[str] = None,
-    db: Session = Depends(get_db)
-):
-    from sqlalchemy.orm import joinedload
-    
-    query = db.query(Book).options(joinedload(Book.genre_obj))
-    
-    if q:
-        query = query.join(Genre, Book.genre_id == Genre.id, isouter=True).filter(or_(
-            Book.title.contains(q),
-            Book.author.contains(q),
-            Genre.name.contains(q)
-        ))
+@router.get("/api/stats")
+async def stats_api(db: AsyncSession = Depends(get_async_db)):
+    return await db.run_sync(get_stats)
+
+def filter_books(db: Session, query, q=None, author=None, genre=None, status=None):
+    """Apply the /books search filters to a Book query"""
+    if q and q.strip():
+        query = query.filter(book_search_clause(db, q))
     
     if author:
         query = query.filter(Book.author.contains(author))
@@ -87,17 +64,108 @@ def books_list(
         except ValueError:
             pass
     
-    books = query.order_by(Book.created_at.desc()).all()
+    return query
+
+def book_to_dict(book: Book):
+    return {
+        "id": book.id,
+        "title": book.title,
+        "author": book.author,
+        "isbn": book.isbn,
+        "genre_id": book.genre_id,
+        "genre": book.genre_obj.name if book.genre_obj else None,
+        "status": book.status.value,
+        "borrower": book.borrower,
+        "due_date": book.due_date.isoformat() if book.due_date else None,
+        "created_at": book.created_at.isoformat()
+    }
+
+def paginate_books(db: Session, q, author, genre, status, after, before, limit):
+    query = db.query(Book).options(joinedload(Book.genre_obj))
+    query = filter_books(db, query, q, author, genre, status)
+    return keyset_paginate(
+        query, Book.created_at, Book.id,
+        after=after, before=before, limit=limit, descending=True
+    )
+
+@router.get("/books", response_class=HTMLResponse)
+async def books_list(
+    request: Request, 
+    q: Optional[str] = None,
+    author: Optional[str] = None,
+    genre: Optional[str] = None,
+    status: Optional[str] = None,
+    after: Optional[str] = None,
+    before: Optional[str] = None,
+    limit: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    page = await db.run_sync(paginate_books, q, author, genre, status, after, before, limit)
     
     return templates.TemplateResponse("books_list.html", {
         "request": request,
-        "books": books,
+        "books": page.items,
+        "next_url": page_url(request, after=page.next_cursor),
+        "prev_url": page_url(request, before=page.prev_cursor),
         "search_query": q or "",
         "author_filter": author or "",
         "genre_filter": genre or "",
         "status_filter": status or ""
     })
 
+@router.get("/api/books")
+async def books_list_api(
+    q: Optional[str] = None,
+    author: Optional[str] = None,
+    genre: Optional[str] = None,
+    status: Optional[str] = None,
+    after: Optional[str] = None,
+    before: Optional[str] = None,
+    limit: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    page = await db.run_sync(paginate_books, q, author, genre, status, after, before, limit)
+    return {
+        "items": [book_to_dict(book) for book in page.items],
+        "next_cursor": page.next_cursor,
+        "prev_cursor": page.prev_cursor,
+        "limit": page.limit
+    }
+
+@router.get("/api/books/search")
+async def books_search_api(q: str, limit: Optional[int] = 20, db: AsyncSession = Depends(get_async_db)):
+    books = await db.run_sync(search_books, q, clamp_page_size(limit))
+    return [book_to_dict(book) for book in books]
+
+@router.post("/api/books/import")
+def books_import_api(
+    file: UploadFile = File(...),
+    format: Optional[str] = Form(None),
+    batch_size: int = Form(DEFAULT_BATCH_SIZE),
+    db: Session = Depends(get_db)
+):
+    fmt = format or detect_format(file.filename or "")
+    if fmt not in ("csv", "jsonl"):
+        raise HTTPException(status_code=400, detail="format must be csv or jsonl")
+    
+    # The upload is spooled to disk by Starlette; read it as a text stream
+    stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    report = ImportReport()
+    try:
+        import_books(db, stream, fmt, batch_size=clamp_batch_size(batch_size), report=report)
+    except UnicodeDecodeError:
+        # The batches before the invalid byte are already committed
+        db.rollback()
+        if report.inserted:
+            invalidate_stats()
+        raise HTTPException(
+            status_code=400,
+            detail=f"file must be UTF-8 encoded ({report.inserted} rows were imported before the invalid byte)"
+        )
+    if report.inserted:
+        invalidate_stats()
+    return asdict(report)
+
 @router.get("/books/new", response_class=HTMLResponse)
 def book_new_form(request: Request, db: Session = Depends(get_db)):
     genres = get_genres_for_dropdown(db)
@@ -171,36 +239,32 @@ def create_book(
     db.add(db_book)
     db.commit()
     db.refresh(db_book)
+    invalidate_stats()
     
     return RedirectResponse(url=f"/books/{db_book.id}", status_code=303)
 
 @router.get("/books/{book_id}", response_class=HTMLResponse)
-def book_detail(request: Request, book_id: int, db: Session = Depends(get_db)):
-    from sqlalchemy.orm import joinedload
-    
-    book = db.query(Book).options(joinedload(Book.genre_obj)).filter(Book.id == book_id).first()
+async def book_detail(request: Request, book_id: int, db: AsyncSession = Depends(get_async_db)):
+    book = (await db.scalars(select(Book).options(BOOK_DETAIL_LOAD).where(Book.id == book_id))).first()
     if not book:
         raise HTTPException(status_code=404, detail="Book not found")
     
-    loans = db.query(Loan).filter(Loan.book_id == book_id).order_by(Loan.checkout_at.desc()).all()
-    reservations = db.query(Reservation).filter(
-        Reservation.book_id == book_id,
-        Reservation.status == ReservationStatus.active
-    ).order_by(Reservation.reserved_at.asc()).all()
-    
-    # Check for overdue loans
-    now = datetime.now()
-    for loan in loans:
-        if loan.returned_at is None and loan.due_date < now:
-            loan.is_overdue = True
-            db.commit()
+    loans = (await db.scalars(
+        select(Loan).where(Loan.book_id == book_id).order_by(Loan.checkout_at.desc())
+    )).all()
+    reservations = (await db.scalars(
+        select(Reservation).where(
+            Reservation.book_id == book_id,
+            Reservation.status == ReservationStatus.active
+        ).order_by(Reservation.reserved_at.asc())
+    )).all()
     
     return templates.TemplateResponse("book_detail.html", {
         "request": request,
         "book": book,
         "loans": loans,
         "reservations": reservations,
-        "can_reserve": book.status == BookStatus.borrowed
+        "can_reserve": book.status != BookStatus.available
     })
 
 @router.get("/books/{book_id}/checkout", response_class=HTMLResponse)
@@ -214,110 +278,94 @@ def checkout_form(request: Request, book_id: int, db: Session = Depends(get_db))
     
     default_due_date = (datetime.now() + timedelta(days=7)).strftime("%Y-%m-%d")
     
-    # Get active employees for dropdown
-    employees = db.query(Employee).filter(Employee.status == EmployeeStatus.active).order_by(Employee.employee_id).all()
+    # The borrower is picked through /api/employees/search
+    return templates.TemplateResponse("checkout.html", {
+        "request": request,
+        "book": book,
+        "default_due_date": default_due_date
+    })
+
+async def checkout_error_response(request: Request, db: AsyncSession, book_id: int, employee_id, due_date: str, error: str):
+    book = await db.get(Book, book_id)
+    if not book:
+        raise HTTPException(status_code=404, detail="Book not found")
+    
+    if book.status == BookStatus.borrowed:
+        return RedirectResponse(url=f"/books/{book_id}", status_code=303)
     
+    index = await db.run_sync(get_employee_index)
+    default_due_date = (datetime.now() + timedelta(days=7)).strftime("%Y-%m-%d")
     return templates.TemplateResponse("checkout.html", {
         "request": request,
         "book": book,
-        "default_due_date": default_due_date,
-        "employees": employees
+        "error": error,
+        "selected_employee": index.get(employee_id),
+        "due_date": due_date,
+        "default_due_date": default_due_date
     })
 
 @router.post("/books/{book_id}/checkout")
-def checkout_book(
+async def checkout_book(
     request: Request,
     book_id: int,
     employee_id: int = Form(...),
     due_date: str = Form(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    book = db.query(Book).filter(Book.id == book_id).first()
-    if not book:
-        raise HTTPException(status_code=404, detail="Book not found")
-    
-    if book.status == BookStatus.borrowed:
-        return RedirectResponse(url=f"/books/{book_id}", status_code=303)
-    
-    # Get employee
-    employee = db.query(Employee).filter(Employee.id == employee_id).first()
-    if not employee:
-        employees = db.query(Employee).filter(Employee.status == EmployeeStatus.active).order_by(Employee.employee_id).all()
-        default_due_date = (datetime.now() + timedelta(days=7)).strftime("%Y-%m-%d")
-        return templates.TemplateResponse("checkout.html", {
-            "request": request,
-            "book": book,
-            "error": "社員が選択されていません",
-            "selected_employee_id": employee_id,
-            "due_date": due_date,
-            "default_due_date": default_due_date,
-            "employees": employees
-        })
-    
     try:
         due_date_obj = datetime.strptime(due_date, "%Y-%m-%d")
     except ValueError:
-        employees = db.query(Employee).filter(Employee.status == EmployeeStatus.active).order_by(Employee.employee_id).all()
-        default_due_date = (datetime.now() + timedelta(days=7)).strftime("%Y-%m-%d")
-        return templates.TemplateResponse("checkout.html", {
-            "request": request,
-            "book": book,
-            "error": "正しい日付を入力してください",
-            "selected_employee_id": employee_id,
-            "due_date": due_date,
-            "default_due_date": default_due_date,
-            "employees": employees
-        })
+        return await checkout_error_response(request, db, book_id, employee_id, due_date, "正しい日付を入力してください")
     
-    book.status = BookStatus.borrowed
-    book.borrower = employee.name  # Keep for backward compatibility
-    book.borrower_employee_id = employee.id
-    book.due_date = due_date_obj
-    book.updated_at = datetime.utcnow()
+    loan = await loan_service.checkout_book(db, book_id, employee_id, due_date_obj)
+    if loan is None:
+        # Book missing or already lent (redirect), held for someone else, or the employee was not found
+        if await db.scalar(select(Book.status).where(Book.id == book_id)) == BookStatus.reserved:
+            error = "この本は予約者のために取り置き中です"
+        else:
+            error = "社員が選択されていません"
+        return await checkout_error_response(request, db, book_id, employee_id, due_date, error)
     
-    loan = Loan(
-        book_id=book_id,
-        employee_id=employee.id,
-        borrower=employee.name,  # Keep for backward compatibility
-        due_date=due_date_obj
-    )
-    db.add(loan)
-    db.commit()
+    invalidate_stats()
+    metrics.CHECKOUTS.inc()
     
     return RedirectResponse(url=f"/books/{book_id}", status_code=303)
 
 @router.post("/books/{book_id}/return")
-def return_book(book_id: int, db: Session = Depends(get_db)):
-    book = db.query(Book).filter(Book.id == book_id).first()
-    if not book:
-        raise HTTPException(status_code=404, detail="Book not found")
-    
-    if book.status == BookStatus.available:
+async def return_book(book_id: int, db: AsyncSession = Depends(get_async_db)):
+    returned = await loan_service.return_book(db, book_id)
+    if not returned:
+        if await db.get(Book, book_id) is None:
+            raise HTTPException(status_code=404, detail="Book not found")
         return RedirectResponse(url=f"/books/{book_id}", status_code=303)
     
-    book.status = BookStatus.available
-    book.borrower = None
-    book.due_date = None
-    book.updated_at = datetime.utcnow()
-    
-    active_loan = db.query(Loan).filter(
-        Loan.book_id == book_id,
-        Loan.returned_at.is_(None)
-    ).first()
-    
-    if active_loan:
-        active_loan.returned_at = datetime.utcnow()
-    
-    db.commit()
+    invalidate_stats()
+    metrics.RETURNS.inc()
     
     return RedirectResponse(url=f"/books/{book_id}", status_code=303)
 
+@router.post("/api/loans/checkout:batch", response_model=schemas.BatchResult)
+async def checkout_batch_api(payload: schemas.BatchCheckoutRequest, db: AsyncSession = Depends(get_async_db)):
+    result = await loan_service.checkout_books(db, payload.book_ids, payload.employee_id, payload.due_date)
+    if result["succeeded"]:
+        invalidate_stats()
+        metrics.CHECKOUTS.inc(result["succeeded"])
+    return result
+
+@router.post("/api/loans/return:batch", response_model=schemas.BatchResult)
+async def return_batch_api(payload: schemas.BatchReturnRequest, db: AsyncSession = Depends(get_async_db)):
+    result = await loan_service.return_books(db, payload.book_ids)
+    if result["succeeded"]:
+        invalidate_stats()
+        metrics.RETURNS.inc(result["succeeded"])
+    return result
+
 # 予約機能
 @router.post("/books/{book_id}/reserve")
 def reserve_book(
     request: Request,
     book_id: int,
-    reserver: str = Form(...),
+    employee_id: int = Form(...),
     db: Session = Depends(get_db)
 ):
     book = db.query(Book).filter(Book.id == book_id).first()
@@ -327,13 +375,14 @@ def reserve_book(
     if book.status == BookStatus.available:
         return RedirectResponse(url=f"/books/{book_id}", status_code=303)
     
-    if not reserver.strip():
+    employee = db.get(Employee, employee_id)
+    if not employee or employee.status != EmployeeStatus.active:
         return RedirectResponse(url=f"/books/{book_id}", status_code=303)
     
-    # Check if user already has active reservation
-    existing_reservation = db.query(Reservation).filter(
+    # Probe of ux_reservations_active_book_employee
+    existing_reservation = db.query(Reservation.id).filter(
         Reservation.book_id == book_id,
-        Reservation.reserver == reserver.strip(),
+        Reservation.employee_id == employee_id,
         Reservation.status == ReservationStatus.active
     ).first()
     
@@ -342,54 +391,53 @@ def reserve_book(
     
     reservation = Reservation(
         book_id=book_id,
-        reserver=reserver.strip()
+        employee_id=employee_id,
+        reserver=employee.name  # Keep for backward compatibility
     )
     db.add(reservation)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        # A concurrent request reserved it first
+        db.rollback()
+        return RedirectResponse(url=f"/books/{book_id}", status_code=303)
+    invalidate_stats()
+    metrics.RESERVATIONS_CREATED.inc()
     
     return RedirectResponse(url=f"/books/{book_id}", status_code=303)
 
 @router.post("/reservations/{reservation_id}/cancel")
 def cancel_reservation(reservation_id: int, db: Session = Depends(get_db)):
-    reservation = db.query(Reservation).filter(Reservation.id == reservation_id).first()
+    # A held book passes to the next in line
+    reservation, cancelled = reservation_queue.cancel_reservation(db, reservation_id)
     if not reservation:
         raise HTTPException(status_code=404, detail="Reservation not found")
     
-    reservation.status = ReservationStatus.cancelled
-    db.commit()
+    if cancelled:
+        invalidate_stats()
+        metrics.RESERVATIONS_CANCELLED.inc()
     
     return RedirectResponse(url=f"/books/{reservation.book_id}", status_code=303)
 
 # 貸出履歴と統計
 @router.get("/loans", response_class=HTMLResponse)
 def loans_history(request: Request, db: Session = Depends(get_db)):
-    loans = db.query(Loan).order_by(Loan.checkout_at.desc()).limit(100).all()
-    overdue_loans = db.query(Loan).filter(
-        Loan.returned_at.is_(None),
-        Loan.due_date < datetime.now()
-    ).all()
+    loans = loans_with_book(db).order_by(Loan.checkout_at.desc()).limit(100).all()
     
     return templates.TemplateResponse("loans_history.html", {
         "request": request,
-        "loans": loans,
-        "overdue_loans": overdue_loans
+        "loans": loans
     })
 
 # 延滞管理
 @router.get("/overdue", response_class=HTMLResponse)
 def overdue_books(request: Request, db: Session = Depends(get_db)):
     now = datetime.now()
-    overdue_loans = db.query(Loan).filter(
+    overdue_loans = loans_with_book(db).filter(
         Loan.returned_at.is_(None),
         Loan.due_date < now
     ).order_by(Loan.due_date.asc()).all()
     
-    # Mark as overdue
-    for loan in overdue_loans:
-        if not loan.is_overdue:
-            loan.is_overdue = True
-    db.commit()
-    
     return templates.TemplateResponse("overdue_books.html", {
         "request": request,
         "overdue_loans": overdue_loans,
@@ -399,7 +447,7 @@ def overdue_books(request: Request, db: Session = Depends(get_db)):
 # 予約一覧
 @router.get("/reservations", response_class=HTMLResponse)
 def reservations_list(request: Request, db: Session = Depends(get_db)):
-    active_reservations = db.query(Reservation).filter(
+    active_reservations = reservations_with_book(db).filter(
         Reservation.status == ReservationStatus.active
     ).order_by(Reservation.reserved_at.asc()).all()
     
@@ -1,38 +1,34 @@
 from fastapi import APIRouter, Depends, HTTPException, Request, Form
 from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from sqlalchemy import func, select
 from datetime import datetime
 from typing import Optional
 
-from ..database import get_db
-from ..models import Employee, EmployeeStatus
+from ..database import get_db, get_async_db
+from ..employee_directory import (
+    MAX_TYPEAHEAD_LIMIT, TYPEAHEAD_LIMIT, employee_search_clause, get_department_facets, get_employee_index,
+    invalidate_department_facets, invalidate_employee_index
+)
+from ..models import Employee, EmployeeStatus, Loan, Reservation, ReservationStatus
+from ..pagination import keyset_paginate, page_url
+from ..queries import loans_with_book, reservations_with_book
+from ..reservations import queue_positions
 from .. import schemas
 
 router = APIRouter()
 templates = Jinja2Templates(directory="templates")
 
-@router.get("/employees", response_class=HTMLResponse)
-def employees_list(
-    request: Request, 
-    q: Optional[str] = None,
-    department: Optional[str] = None,
-    status: Optional[str] = None,
-    db: Session = Depends(get_db)
-):
-    query = db.query(Employee)
-    
-    if q:
-        query = query.filter(or_(
-            Employee.name.contains(q),
-            Employee.employee_id.contains(q),
-            Employee.name_kana.contains(q) if Employee.name_kana else False,
-            Employee.email.contains(q) if Employee.email else False
-        ))
+def filter_employees(query, q=None, department=None, status=None):
+    """Apply the /employees search filters to an Employee query"""
+    if q and q.strip():
+        # Prefix match on the indexed columns
+        query = query.filter(employee_search_clause(q))
     
     if department:
-        query = query.filter(Employee.department.contains(department))
+        query = query.filter(Employee.department == department)
     
     if status:
         try:
@@ -41,21 +37,79 @@ def employees_list(
         except ValueError:
             pass
     
-    employees = query.order_by(Employee.employee_id).all()
-    
-    # Get unique departments for filter dropdown
-    departments = db.query(Employee.department).filter(Employee.department.isnot(None)).distinct().all()
-    departments = [dept[0] for dept in departments if dept[0]]
+    return query
+
+def employee_to_dict(employee: Employee):
+    return {
+        "id": employee.id,
+        "employee_id": employee.employee_id,
+        "name": employee.name,
+        "name_kana": employee.name_kana,
+        "department": employee.department,
+        "position": employee.position,
+        "status": employee.status.value
+    }
+
+def paginate_employees(db: Session, q, department, status, after, before, limit):
+    query = filter_employees(db.query(Employee), q, department, status)
+    return keyset_paginate(
+        query, Employee.employee_id, Employee.id,
+        after=after, before=before, limit=limit
+    )
+
+def loan_summary(db: Session, employee_id: int, now: datetime) -> dict:
+    """Total, currently borrowed and overdue loan counts in one aggregate query"""
+    is_open = Loan.returned_at.is_(None)
+    total, borrowed, overdue = db.query(
+        func.count(Loan.id),
+        func.count(Loan.id).filter(is_open),
+        func.count(Loan.id).filter(is_open, Loan.due_date < now)
+    ).filter(Loan.employee_id == employee_id).one()
+    return {"total": total, "borrowed": borrowed, "overdue": overdue}
+
+@router.get("/employees", response_class=HTMLResponse)
+def employees_list(
+    request: Request, 
+    q: Optional[str] = None,
+    department: Optional[str] = None,
+    status: Optional[str] = None,
+    after: Optional[str] = None,
+    before: Optional[str] = None,
+    limit: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    page = paginate_employees(db, q, department, status, after, before, limit)
     
     return templates.TemplateResponse("employees_list.html", {
         "request": request,
-        "employees": employees,
+        "employees": page.items,
+        "next_url": page_url(request, after=page.next_cursor),
+        "prev_url": page_url(request, before=page.prev_cursor),
         "search_query": q or "",
         "department_filter": department or "",
         "status_filter": status or "",
-        "departments": departments
+        "departments": get_department_facets(db)
     })
 
+@router.get("/api/employees/directory")
+def employees_directory_api(
+    q: Optional[str] = None,
+    department: Optional[str] = None,
+    status: Optional[str] = None,
+    after: Optional[str] = None,
+    before: Optional[str] = None,
+    limit: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    page = paginate_employees(db, q, department, status, after, before, limit)
+    return {
+        "items": [employee_to_dict(employee) for employee in page.items],
+        "next_cursor": page.next_cursor,
+        "prev_cursor": page.prev_cursor,
+        "limit": page.limit,
+        "departments": get_department_facets(db)
+    }
+
 @router.get("/employees/new", response_class=HTMLResponse)
 def employee_new_form(request: Request):
     return templates.TemplateResponse("employee_new.html", {"request": request})
@@ -140,30 +194,56 @@ def create_employee(
     db.add(db_employee)
     db.commit()
     db.refresh(db_employee)
+    invalidate_department_facets()
+    invalidate_employee_index()
     
     return RedirectResponse(url=f"/employees/{db_employee.id}", status_code=303)
 
 @router.get("/employees/{employee_id}", response_class=HTMLResponse)
-def employee_detail(request: Request, employee_id: int, db: Session = Depends(get_db)):
-    from sqlalchemy.orm import joinedload
-    
-    employee = db.query(Employee).filter(Employee.id == employee_id).first()
+def employee_detail(
+    request: Request,
+    employee_id: int,
+    after: Optional[str] = None,
+    before: Optional[str] = None,
+    limit: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    employee = db.get(Employee, employee_id)
     if not employee:
         raise HTTPException(status_code=404, detail="Employee not found")
     
-    # Get loan history for this employee
-    loans = db.query(employee.loans).order_by(employee.loans.checkout_at.desc()).all()
+    now = datetime.now()
+    summary = loan_summary(db, employee_id, now)
     
-    # Get active reservations for this employee
-    reservations = db.query(employee.reservations).filter(
-        employee.reservations.status == "active"
-    ).all()
+    # Open loans are few; list them all, most urgent first
+    active_loans = loans_with_book(db).filter(
+        Loan.employee_id == employee_id,
+        Loan.returned_at.is_(None)
+    ).order_by(Loan.due_date.asc()).all()
+    
+    # Returned loans, newest first, one page at a time
+    history = keyset_paginate(
+        loans_with_book(db).filter(Loan.employee_id == employee_id, Loan.returned_at.isnot(None)),
+        Loan.checkout_at, Loan.id,
+        after=after, before=before, limit=limit, descending=True
+    )
+    
+    reservations = reservations_with_book(db).filter(
+        Reservation.employee_id == employee_id,
+        Reservation.status == ReservationStatus.active
+    ).order_by(Reservation.reserved_at.asc()).all()
     
     return templates.TemplateResponse("employee_detail.html", {
         "request": request,
         "employee": employee,
-        "loans": loans,
-        "reservations": reservations
+        "summary": summary,
+        "active_loans": active_loans,
+        "loans": history.items,
+        "next_url": page_url(request, after=history.next_cursor),
+        "prev_url": page_url(request, before=history.prev_cursor),
+        "reservations": reservations,
+        "queue_positions": queue_positions(db, [r.id for r in reservations]),
+        "current_time": now
     })
 
 @router.get("/employees/{employee_id}/edit", response_class=HTMLResponse)
@@ -242,17 +322,26 @@ def update_employee(
     employee.updated_at = datetime.utcnow()
     
     db.commit()
+    invalidate_department_facets()
+    invalidate_employee_index()
     
     return RedirectResponse(url=f"/employees/{employee_id}", status_code=303)
 
 # API endpoints for dropdown population
 @router.get("/api/employees")
-def get_employees_api(status: str = "active", db: Session = Depends(get_db)):
-    query = db.query(Employee).filter(Employee.status == EmployeeStatus(status))
-    employees = query.order_by(Employee.employee_id).all()
+async def get_employees_api(status: str = "active", db: AsyncSession = Depends(get_async_db)):
+    employees = (await db.scalars(
+        select(Employee).where(Employee.status == EmployeeStatus(status)).order_by(Employee.employee_id)
+    )).all()
     return [{"id": emp.id, "employee_id": emp.employee_id, "name": emp.name, "department": emp.department} for emp in employees]
 
 @router.get("/api/employees/active")
-def get_active_employees_api(db: Session = Depends(get_db)):
-    employees = db.query(Employee).filter(Employee.status == EmployeeStatus.active).order_by(Employee.employee_id).all()
-    return [{"id": emp.id, "employee_id": emp.employee_id, "name": emp.name, "department": emp.department} for emp in employees]
\ No newline at end of file
+async def get_active_employees_api(db: AsyncSession = Depends(get_async_db)):
+    index = await db.run_sync(get_employee_index)
+    return index.ordered
+
+# Typeahead for the checkout form
+@router.get("/api/employees/search")
+async def search_employees_api(prefix: str = "", limit: int = TYPEAHEAD_LIMIT, db: AsyncSession = Depends(get_async_db)):
+    index = await db.run_sync(get_employee_index)
+    return index.search(prefix, max(1, min(limit, MAX_TYPEAHEAD_LIMIT)))
\ No newline at end of file
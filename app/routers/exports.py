@@ -0,0 +1,80 @@
+from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from datetime import datetime
+from typing import Optional
+
+from ..exporter import stream_csv, stream_jsonl
+from ..models import Book, Loan, Employee, Genre
+from .books import filter_books
+from .employees import filter_employees
+
+router = APIRouter()
+
+BOOK_COLUMNS = [
+    Book.id, Book.title, Book.author, Book.description, Book.genre_id, Book.isbn,
+    Book.publisher, Book.publication_year, Book.pages, Book.status, Book.borrower,
+    Book.borrower_employee_id, Book.due_date, Book.created_at, Book.updated_at,
+]
+
+LOAN_COLUMNS = [
+    Loan.id, Loan.book_id, Loan.employee_id, Loan.borrower, Loan.checkout_at,
+    Loan.due_date, Loan.returned_at, Loan.is_overdue,
+]
+
+EMPLOYEE_COLUMNS = [
+    Employee.id, Employee.employee_id, Employee.name, Employee.name_kana, Employee.email,
+    Employee.department, Employee.position, Employee.phone, Employee.hire_date,
+    Employee.status, Employee.created_at, Employee.updated_at,
+]
+
+def _names(columns):
+    return [column.key for column in columns]
+
+def _attachment(body, filename, media_type):
+    return StreamingResponse(body, media_type=media_type, headers={
+        "Content-Disposition": f'attachment; filename="{filename}"'
+    })
+
+@router.get("/export/books.csv")
+def export_books(
+    q: Optional[str] = None,
+    author: Optional[str] = None,
+    genre: Optional[str] = None,
+    status: Optional[str] = None
+):
+    columns = BOOK_COLUMNS + [Genre.name.label("genre_name")]
+    
+    def build(db):
+        stmt = select(*columns).outerjoin(Genre, Book.genre_id == Genre.id)
+        # Filters match the /books page; the genre join above is reused
+        stmt = filter_books(db, stmt, q, author, None, status)
+        if genre:
+            stmt = stmt.where(Genre.name.contains(genre))
+        return stmt.order_by(Book.id)
+    
+    return _attachment(stream_csv(build, _names(BOOK_COLUMNS) + ["genre_name"]), "books.csv", "text/csv; charset=utf-8")
+
+@router.get("/export/loans.jsonl")
+def export_loans(active: Optional[bool] = None, overdue: Optional[bool] = None):
+    def build(db):
+        stmt = select(*LOAN_COLUMNS)
+        if active is not None:
+            stmt = stmt.where(Loan.returned_at.is_(None) if active else Loan.returned_at.isnot(None))
+        if overdue:
+            # Same condition as the /overdue page
+            stmt = stmt.where(Loan.returned_at.is_(None), Loan.due_date < datetime.now())
+        return stmt.order_by(Loan.id)
+    
+    return _attachment(stream_jsonl(build, _names(LOAN_COLUMNS)), "loans.jsonl", "application/x-ndjson")
+
+@router.get("/export/employees.csv")
+def export_employees(
+    q: Optional[str] = None,
+    department: Optional[str] = None,
+    status: Optional[str] = None
+):
+    def build(db):
+        return filter_employees(select(*EMPLOYEE_COLUMNS), q, department, status).order_by(Employee.employee_id)
+    
+    return _attachment(stream_csv(build, _names(EMPLOYEE_COLUMNS)), "employees.csv", "text/csv; charset=utf-8")
@@ -1,10 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, Request, Form
 from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import Optional, List
 
-from ..database import get_db
+from ..database import get_db, get_async_db
+from ..genre_cache import get_genre_tree, invalidate_genre_cache
 from ..models import Genre
 from .. import schemas
 
@@ -13,21 +15,7 @@ templates = Jinja2Templates(directory="templates")
 
 @router.get("/genres", response_class=HTMLResponse)
 def genres_list(request: Request, db: Session = Depends(get_db)):
-    # Get all genres with their hierarchical structure
-    root_genres = db.query(Genre).filter(Genre.parent_id.is_(None)).order_by(Genre.name).all()
-    
-    def build_genre_tree(parent_genres):
-        tree = []
-        for genre in parent_genres:
-            children = db.query(Genre).filter(Genre.parent_id == genre.id).order_by(Genre.name).all()
-            genre_data = {
-                'genre': genre,
-                'children': build_genre_tree(children) if children else []
-            }
-            tree.append(genre_data)
-        return tree
-    
-    genre_tree = build_genre_tree(root_genres)
+    genre_tree = get_genre_tree(db).tree()
     
     return templates.TemplateResponse("genres_list.html", {
         "request": request,
@@ -43,7 +31,7 @@ def genre_new_form(request: Request, parent_id: Optional[int] = None, db: Sessio
             raise HTTPException(status_code=404, detail="Parent genre not found")
     
     # Get genres for parent selection (only levels 1 and 2 can be parents)
-    all_genres = db.query(Genre).filter(Genre.level < 3).order_by(Genre.level, Genre.name).all()
+    all_genres = get_genre_tree(db).parent_options()
     
     return templates.TemplateResponse("genre_new.html", {
         "request": request,
@@ -60,7 +48,7 @@ def create_genre(
     db: Session = Depends(get_db)
 ):
     if not name.strip():
-        all_genres = db.query(Genre).filter(Genre.level < 3).order_by(Genre.level, Genre.name).all()
+        all_genres = get_genre_tree(db).parent_options()
         return templates.TemplateResponse("genre_new.html", {
             "request": request,
             "error": "ジャンル名は必須です",
@@ -72,7 +60,7 @@ def create_genre(
     # Check for duplicate names
     existing_genre = db.query(Genre).filter(Genre.name == name.strip()).first()
     if existing_genre:
-        all_genres = db.query(Genre).filter(Genre.level < 3).order_by(Genre.level, Genre.name).all()
+        all_genres = get_genre_tree(db).parent_options()
         return templates.TemplateResponse("genre_new.html", {
             "request": request,
             "error": "このジャンル名は既に存在します",
@@ -91,7 +79,7 @@ def create_genre(
             if parent_genre:
                 level = parent_genre.level + 1
                 if level > 3:  # Max 3 levels
-                    all_genres = db.query(Genre).filter(Genre.level < 3).order_by(Genre.level, Genre.name).all()
+                    all_genres = get_genre_tree(db).parent_options()
                     return templates.TemplateResponse("genre_new.html", {
                         "request": request,
                         "error": "ジャンルは3階層までです",
@@ -111,6 +99,7 @@ def create_genre(
     db.add(db_genre)
     db.commit()
     db.refresh(db_genre)
+    invalidate_genre_cache()
     
     return RedirectResponse(url="/genres", status_code=303)
 
@@ -121,10 +110,7 @@ def genre_edit_form(request: Request, genre_id: int, db: Session = Depends(get_d
         raise HTTPException(status_code=404, detail="Genre not found")
     
     # Get genres for parent selection (exclude self and descendants, max level 2 can be parent)
-    all_genres = db.query(Genre).filter(
-        Genre.id != genre_id, 
-        Genre.level < 3
-    ).order_by(Genre.level, Genre.name).all()
+    all_genres = get_genre_tree(db).parent_options(exclude_id=genre_id)
     
     return templates.TemplateResponse("genre_edit.html", {
         "request": request,
@@ -146,7 +132,7 @@ def update_genre(
         raise HTTPException(status_code=404, detail="Genre not found")
     
     if not name.strip():
-        all_genres = db.query(Genre).filter(Genre.id != genre_id, Genre.level < 3).order_by(Genre.level, Genre.name).all()
+        all_genres = get_genre_tree(db).parent_options(exclude_id=genre_id)
         return templates.TemplateResponse("genre_edit.html", {
             "request": request,
             "error": "ジャンル名は必須です",
@@ -160,7 +146,7 @@ def update_genre(
         Genre.id != genre_id
     ).first()
     if existing_genre:
-        all_genres = db.query(Genre).filter(Genre.id != genre_id, Genre.level < 3).order_by(Genre.level, Genre.name).all()
+        all_genres = get_genre_tree(db).parent_options(exclude_id=genre_id)
         return templates.TemplateResponse("genre_edit.html", {
             "request": request,
             "error": "このジャンル名は既に存在します",
@@ -190,6 +176,7 @@ def update_genre(
         genre.level = 1
     
     db.commit()
+    invalidate_genre_cache()
     
     return RedirectResponse(url="/genres", status_code=303)
 
@@ -212,27 +199,16 @@ def delete_genre(genre_id: int, db: Session = Depends(get_db)):
     
     db.delete(genre)
     db.commit()
+    invalidate_genre_cache()
     
     return RedirectResponse(url="/genres", status_code=303)
 
 # API endpoints for dropdown population
 @router.get("/api/genres")
-def get_genres_api(db: Session = Depends(get_db)):
-    genres = db.query(Genre).order_by(Genre.level, Genre.name).all()
+async def get_genres_api(db: AsyncSession = Depends(get_async_db)):
+    genres = (await db.run_sync(get_genre_tree)).genres
     return [{"id": g.id, "name": g.name, "level": g.level, "parent_id": g.parent_id} for g in genres]
 
 @router.get("/api/genres/tree")
-def get_genres_tree_api(db: Session = Depends(get_db)):
-    def build_tree(parent_id=None):
-        genres = db.query(Genre).filter(Genre.parent_id == parent_id).order_by(Genre.name).all()
-        tree = []
-        for genre in genres:
-            tree.append({
-                "id": genre.id,
-                "name": genre.name,
-                "level": genre.level,
-                "children": build_tree(genre.id)
-            })
-        return tree
-    
-    return build_tree()
\ No newline at end of file
+async def get_genres_tree_api(db: AsyncSession = Depends(get_async_db)):
+    return (await db.run_sync(get_genre_tree)).api_tree()
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
 from typing import Optional, List
 from .models import BookStatus, ReservationStatus, EmployeeStatus
@@ -101,6 +101,27 @@ class CheckoutRequest(BaseModel):
     borrower: str
     due_date: datetime
 
+# Drop-box sweeps are processed in batches of up to a few hundred books
+MAX_BATCH_SIZE = 500
+
+class BatchCheckoutRequest(BaseModel):
+    book_ids: List[int] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+    employee_id: int
+    due_date: datetime
+
+class BatchReturnRequest(BaseModel):
+    book_ids: List[int] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+
+class BatchItemResult(BaseModel):
+    book_id: int
+    ok: bool
+    error: Optional[str] = None
+
+class BatchResult(BaseModel):
+    succeeded: int
+    failed: int
+    results: List[BatchItemResult]
+
 class LoanBase(BaseModel):
     borrower: str
     due_date: datetime
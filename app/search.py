@@ -0,0 +1,183 @@
+"""Full-text search over book titles and authors.
+
+SQLite uses an FTS5 table (``books_fts``) with the trigram tokenizer, which
+indexes every 3-character window and therefore handles kana/kanji without a
+word segmenter. Triggers keep it in sync with ``books`` on insert/update/delete.
+
+PostgreSQL uses pg_trgm GIN indexes on ``books.title`` and ``books.author``,
+which serve ``LIKE '%q%'`` directly and give a similarity score for ranking.
+
+Queries shorter than three characters cannot be answered by a trigram index
+and fall back to a plain LIKE scan.
+
+When the text index can serve the query, the listing first collects the
+candidate ids from the FTS/trigram index and from ix_books_genre_id_created_at_id
+and then orders and limits only those rows. OR-ing the two conditions into the
+ordered query lets SQLite walk the whole created_at index, testing every row,
+which for a rare term means reading the entire table. Only a term with more
+than SEARCH_CANDIDATE_LIMIT candidates keeps the OR form: its matches are
+dense enough that the walk fills a page early.
+
+The index is created by schema migration 0003 (create_search_index); at
+runtime each process checks once, on the first search, whether the FTS
+table exists.
+"""
+import logging
+import os
+
+from sqlalchemy import Column, Integer, MetaData, Table, func, literal_column, or_, select, text
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlalchemy.orm import joinedload
+
+from .models import Book, Genre
+
+logger = logging.getLogger(__name__)
+
+MIN_TRIGRAM_LENGTH = 3
+
+# Above this many candidate ids a search walks the listing order instead
+SEARCH_CANDIDATE_LIMIT = int(os.getenv("SEARCH_CANDIDATE_LIMIT", "2000"))
+
+# Not part of Base.metadata: create_all must not try to create a plain table
+books_fts = Table("books_fts", MetaData(), Column("rowid", Integer))
+
+# None until the first search in this process has looked for books_fts
+_fts_enabled = None
+
+SQLITE_SETUP = [
+    """CREATE VIRTUAL TABLE books_fts USING fts5(
+        title, author, content='books', content_rowid='id', tokenize='trigram'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS books_fts_ai AFTER INSERT ON books BEGIN
+        INSERT INTO books_fts(rowid, title, author) VALUES (new.id, new.title, new.author);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS books_fts_ad AFTER DELETE ON books BEGIN
+        INSERT INTO books_fts(books_fts, rowid, title, author) VALUES ('delete', old.id, old.title, old.author);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS books_fts_au AFTER UPDATE OF title, author ON books BEGIN
+        INSERT INTO books_fts(books_fts, rowid, title, author) VALUES ('delete', old.id, old.title, old.author);
+        INSERT INTO books_fts(rowid, title, author) VALUES (new.id, new.title, new.author);
+    END""",
+    # Index rows that existed before the FTS table was created
+    "INSERT INTO books_fts(books_fts) VALUES ('rebuild')",
+]
+
+POSTGRES_SETUP = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_books_title_trgm ON books USING gin (title gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_books_author_trgm ON books USING gin (author gin_trgm_ops)",
+]
+
+def create_search_index(conn):
+    """Create the search index for the connection's backend (idempotent).
+
+    Runs in a savepoint: if FTS5/pg_trgm is unavailable the migration still
+    succeeds and searches keep working through LIKE."""
+    try:
+        with conn.begin_nested():
+            if conn.dialect.name == "sqlite":
+                if not _fts_table_exists(conn):
+                    for statement in SQLITE_SETUP:
+                        conn.execute(text(statement))
+            elif conn.dialect.name == "postgresql":
+                for statement in POSTGRES_SETUP:
+                    conn.execute(text(statement))
+    except (OperationalError, ProgrammingError):
+        logger.warning("Search index setup skipped; searches fall back to LIKE", exc_info=True)
+
+def drop_search_index(conn):
+    if conn.dialect.name == "sqlite":
+        for trigger in ("books_fts_ai", "books_fts_ad", "books_fts_au"):
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+        conn.execute(text("DROP TABLE IF EXISTS books_fts"))
+    elif conn.dialect.name == "postgresql":
+        conn.execute(text("DROP INDEX IF EXISTS ix_books_title_trgm"))
+        conn.execute(text("DROP INDEX IF EXISTS ix_books_author_trgm"))
+
+def _fts_table_exists(conn) -> bool:
+    return conn.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'books_fts'"
+    )).first() is not None
+
+def _fts_phrase(q: str) -> str:
+    # A quoted phrase is matched as a substring by the trigram tokenizer
+    return '"' + q.replace('"', '""') + '"'
+
+def _use_trigram_index(db, q: str) -> bool:
+    return db.get_bind().dialect.name == "postgresql" and len(q) >= MIN_TRIGRAM_LENGTH
+
+def _use_fts(db, q: str) -> bool:
+    global _fts_enabled
+    if db.get_bind().dialect.name != "sqlite" or len(q) < MIN_TRIGRAM_LENGTH:
+        return False
+    if _fts_enabled is None:
+        _fts_enabled = _fts_table_exists(db)
+    return _fts_enabled
+
+def _fts_match(q: str):
+    return select(books_fts.c.rowid).where(literal_column("books_fts").op("MATCH")(_fts_phrase(q)))
+
+def _genre_match(q: str):
+    return Book.genre_id.in_(select(Genre.id).where(Genre.name.contains(q, autoescape=True)))
+
+def _like_match(q: str):
+    return or_(
+        Book.title.contains(q, autoescape=True),
+        Book.author.contains(q, autoescape=True)
+    )
+
+def _text_hits(db, q: str):
+    """Ids of books whose title or author contains `q`, from the text index"""
+    if _use_fts(db, q):
+        return _fts_match(q)
+    # The pg_trgm indexes serve this LIKE directly
+    return select(Book.id).where(_like_match(q))
+
+def book_search_clause(db, q: str):
+    """Filter expression matching books whose title, author or genre contains `q`"""
+    q = q.strip()
+    if not (_use_fts(db, q) or _use_trigram_index(db, q)):
+        # No index can find the rows; scan in listing order and stop at the page size
+        return or_(_like_match(q), _genre_match(q))
+
+    text_hits = _text_hits(db, q)
+    # UNION ALL streams, so the LIMIT stops both index scans early
+    candidates = text_hits.union_all(select(Book.id).where(_genre_match(q))).limit(SEARCH_CANDIDATE_LIMIT + 1)
+    ids = db.scalars(candidates).all()
+    if len(ids) <= SEARCH_CANDIDATE_LIMIT:
+        return Book.id.in_(set(ids))
+    # A common term matches densely, so walking the listing order fills a page
+    # after a few rows. The +0 keeps the planner from answering the OR through
+    # the genre index and sorting every match instead.
+    genre_ids = select(Genre.id).where(Genre.name.contains(q, autoescape=True))
+    return or_(Book.id.in_(text_hits), (Book.genre_id + 0).in_(genre_ids))
+
+def search_books(db, q: str, limit: int = 20):
+    """Return up to `limit` books matching `q`, most relevant first"""
+    q = q.strip()
+    if not q:
+        return []
+
+    dialect = db.get_bind().dialect.name
+    if _use_fts(db, q):
+        ranked_ids = [row[0] for row in db.execute(
+            _fts_match(q).order_by(literal_column("rank")).limit(limit)
+        )]
+        books = {
+            b.id: b for b in db.query(Book).options(joinedload(Book.genre_obj)).filter(Book.id.in_(ranked_ids))
+        } if ranked_ids else {}
+        results = [books[book_id] for book_id in ranked_ids if book_id in books]
+        if len(results) < limit:
+            # Books matched only through their genre come after text hits
+            results += db.query(Book).options(joinedload(Book.genre_obj)).filter(
+                _genre_match(q), Book.id.notin_(ranked_ids)
+            ).order_by(Book.created_at.desc()).limit(limit - len(results)).all()
+        return results
+
+    query = db.query(Book).options(joinedload(Book.genre_obj)).filter(book_search_clause(db, q))
+    if _use_trigram_index(db, q):
+        score = func.greatest(func.word_similarity(q, Book.title), func.word_similarity(q, Book.author))
+        query = query.order_by(score.desc(), Book.created_at.desc())
+    else:
+        query = query.order_by(Book.created_at.desc())
+    return query.limit(limit).all()
@@ -0,0 +1,329 @@
+"""Sample and synthetic data for development and load testing.
+
+Nothing here runs at app startup; use ``python seed_data.py``.
+
+``create_sample_data`` adds the small demo dataset to an empty database.
+``generate_synthetic_data`` bulk-inserts large, reproducible datasets
+(e.g. 100k books, 10k employees, 1M loans) with one executemany INSERT per
+batch. Books currently on loan get a matching open loan, so the generated
+data is consistent with what checkout/return would have produced.
+"""
+import os
+import random
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert, select, update
+
+from .models import Book, BookStatus, Employee, EmployeeStatus, Genre, Loan
+
+DEFAULT_SEED_BATCH_SIZE = int(os.getenv("SEED_BATCH_SIZE", "5000"))
+
+def create_sample_data(db) -> bool:
+    """Create the demo employees, genres and books in an empty database;
+    returns False if data already exists."""
+    # Only create sample data in an empty database
+    existing_genres = db.query(Genre).count()
+    existing_books = db.query(Book).count()
+    existing_employees = db.query(Employee).count()
+    
+    # Skip if data already exists
+    if existing_genres > 0 or existing_books > 0:
+        print("Data already exists, skipping sample data creation")
+        return False
+    
+    print("Creating sample data...")
+    
+    # Create sample employees first
+    if existing_employees == 0:
+        sample_employees = [
+            Employee(
+                employee_id="E001",
+                name="田中太郎",
+                name_kana="タナカタロウ",
+                email="tanaka@company.com",
+                department="システム開発部",
+                position="シニアエンジニア",
+                phone="03-1234-5678",
+                hire_date=datetime(2020, 4, 1),
+                status=EmployeeStatus.active,
+                notes="Pythonエンジニア"
+            ),
+            Employee(
+                employee_id="E002",
+                name="佐藤花子",
+                name_kana="サトウハナコ",
+                email="sato@company.com",
+                department="プロジェクト管理部",
+                position="プロジェクトマネージャー",
+                phone="03-1234-5679",
+                hire_date=datetime(2019, 7, 15),
+                status=EmployeeStatus.active,
+                notes="アジャイル開発専門"
+            ),
+            Employee(
+                employee_id="E003",
+                name="鈴木一郎",
+                name_kana="スズキイチロウ",
+                email="suzuki@company.com",
+                department="データ分析部",
+                position="データアナリスト",
+                phone="03-1234-5680",
+                hire_date=datetime(2021, 1, 10),
+                status=EmployeeStatus.active,
+                notes="機械学習・統計分析"
+            )
+        ]
+        
+        for employee in sample_employees:
+            db.add(employee)
+        db.commit()
+        print("サンプル社員データを作成しました")
+    
+    # Create sample genres if they don't exist
+    if existing_genres == 0:
+        sample_genres = [
+            Genre(name="技術書", level=1, description="プログラミングや技術関連の書籍"),
+            Genre(name="文学", level=1, description="小説や詩集など"),
+            Genre(name="ビジネス", level=1, description="経営やビジネススキル関連"),
+            Genre(name="プログラミング", parent_id=1, level=2, description="プログラミング言語や開発手法"),
+            Genre(name="データベース", parent_id=1, level=2, description="データベース設計や管理"),
+            Genre(name="小説", parent_id=2, level=2, description="フィクション作品"),
+            Genre(name="Python", parent_id=4, level=3, description="Python言語関連"),
+            Genre(name="Web開発", parent_id=4, level=3, description="Web開発技術"),
+        ]
+        
+        for genre in sample_genres:
+            db.add(genre)
+        db.commit()
+        
+        # Update parent_id for child genres
+        for genre in sample_genres:
+            if genre.level > 1:
+                parent_name_map = {
+                    "プログラミング": "技術書",
+                    "データベース": "技術書", 
+                    "小説": "文学",
+                    "Python": "プログラミング",
+                    "Web開発": "プログラミング"
+                }
+                if genre.name in parent_name_map:
+                    parent = db.query(Genre).filter(Genre.name == parent_name_map[genre.name]).first()
+                    if parent:
+                        genre.parent_id = parent.id
+        db.commit()
+    
+    # Create sample books
+    print("Creating sample books...")
+    # Get sample genres for books
+    python_genre = db.query(Genre).filter(Genre.name == "Python").first()
+    web_genre = db.query(Genre).filter(Genre.name == "Web開発").first()
+    db_genre = db.query(Genre).filter(Genre.name == "データベース").first()
+    
+    sample_books = [
+        Book(
+                title="Pythonプログラミング入門",
+                author="山田太郎",
+                description="Pythonの基礎から応用まで学べる入門書です。初心者にもわかりやすく解説されています。",
+                genre_id=python_genre.id if python_genre else None,
+                isbn="978-4-123456-78-9",
+                publisher="技術出版社",
+                publication_year=2023,
+                pages=350,
+                status=BookStatus.available,
+                created_at=datetime.utcnow(),
+                updated_at=datetime.utcnow()
+            ),
+            Book(
+                title="FastAPI実践ガイド",
+                author="佐藤花子",
+                description="FastAPIを使ったWebアプリケーション開発の実践的なガイドブックです。",
+                genre_id=web_genre.id if web_genre else None,
+                isbn="978-4-987654-32-1",
+                publisher="Web開発出版",
+                publication_year=2023,
+                pages=280,
+                status=BookStatus.available,
+                created_at=datetime.utcnow(),
+                updated_at=datetime.utcnow()
+            ),
+            Book(
+                title="データベース設計",
+                author="田中次郎",
+                description="効率的なデータベース設計の手法とベストプラクティスを解説した専門書です。",
+                genre_id=db_genre.id if db_genre else None,
+                isbn="978-4-555666-77-8",
+                publisher="データベース出版",
+                publication_year=2022,
+                pages=420,
+                status=BookStatus.borrowed,
+                borrower="鈴木一郎",
+                borrower_employee_id=3,  # E003 - 鈴木一郎
+                due_date=datetime(2024, 1, 15),
+                created_at=datetime.utcnow(),
+                updated_at=datetime.utcnow()
+            )
+    ]
+    
+    for book in sample_books:
+        db.add(book)
+    db.commit()
+    print("サンプルデータを作成しました")
+    return True
+
+
+DEPARTMENTS = [
+    "システム開発部", "プロジェクト管理部", "データ分析部", "営業部",
+    "人事部", "経理部", "総務部", "品質保証部", "研究開発部", "カスタマーサポート部",
+]
+POSITIONS = ["メンバー", "主任", "係長", "課長", "部長", "シニアエンジニア", "データアナリスト"]
+LAST_NAMES = ["佐藤", "鈴木", "高橋", "田中", "伊藤", "渡辺", "山本", "中村", "小林", "加藤"]
+FIRST_NAMES = ["太郎", "花子", "一郎", "美咲", "健太", "陽子", "翔", "さくら", "大輔", "由美"]
+TITLE_WORDS = ["入門", "実践", "設計", "完全ガイド", "基礎", "応用", "徹底解説", "ハンドブック", "教科書", "レシピ"]
+TOPICS = ["Python", "FastAPI", "データベース", "SQL", "機械学習", "Web開発", "クラウド", "セキュリティ", "アルゴリズム", "統計"]
+PUBLISHERS = ["技術出版社", "Web開発出版", "データベース出版", "情報科学社", "実務書房"]
+
+LOAN_DAYS = 14
+HISTORY_DAYS = 3 * 365
+
+@dataclass
+class SeedReport:
+    employees: int = 0
+    books: int = 0
+    loans: int = 0
+    open_loans: int = 0
+
+def _insert_batches(db, model, rows, batch_size, label, progress=None):
+    """executemany INSERT `rows` (an iterator of dicts) in batches; returns the count"""
+    count = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            db.execute(insert(model), batch)
+            db.commit()
+            count += len(batch)
+            batch = []
+            if progress:
+                progress(label, count)
+    if batch:
+        db.execute(insert(model), batch)
+        db.commit()
+        count += len(batch)
+    if progress:
+        progress(label, count)
+    return count
+
+def _max_id(db, model):
+    return db.scalar(select(func.coalesce(func.max(model.id), 0)))
+
+def _employee_rows(rng, start, count, now):
+    for n in range(start, start + count):
+        last, first = rng.choice(LAST_NAMES), rng.choice(FIRST_NAMES)
+        yield {
+            "employee_id": f"S{n:07d}",
+            "name": f"{last}{first}{n}",
+            "name_kana": None,
+            "email": f"s{n:07d}@example.com",
+            "department": rng.choice(DEPARTMENTS),
+            "position": rng.choice(POSITIONS),
+            "phone": None,
+            "hire_date": now - timedelta(days=rng.randrange(30, 20 * 365)),
+            "status": EmployeeStatus.active if rng.random() < 0.9 else EmployeeStatus.inactive,
+            "notes": None,
+            "created_at": now,
+            "updated_at": now,
+        }
+
+def _book_rows(rng, start, count, genre_ids, now):
+    for n in range(start, start + count):
+        topic = rng.choice(TOPICS)
+        created = now - timedelta(seconds=rng.randrange(HISTORY_DAYS * 86400))
+        yield {
+            "title": f"{topic}{rng.choice(TITLE_WORDS)} 第{n}版",
+            "author": f"{rng.choice(LAST_NAMES)}{rng.choice(FIRST_NAMES)}",
+            "description": None,
+            "genre_id": rng.choice(genre_ids) if genre_ids else None,
+            "genre": None,
+            "isbn": f"979-0-{n:09d}",
+            "publisher": rng.choice(PUBLISHERS),
+            "publication_year": rng.randrange(1990, now.year + 1),
+            "pages": rng.randrange(80, 900),
+            "status": BookStatus.available,
+            "created_at": created,
+            "updated_at": created,
+        }
+
+def _loan_rows(rng, book_ids, employees, count, open_books, now):
+    """`count` loans; the first ones are the open loans of `open_books`,
+    the rest are returned loans spread over the history window."""
+    for book_id in open_books:
+        employee_id, name = rng.choice(employees)
+        checkout = now - timedelta(days=rng.randrange(0, 2 * LOAN_DAYS))
+        due = checkout + timedelta(days=LOAN_DAYS)
+        yield {
+            "book_id": book_id, "employee_id": employee_id, "borrower": name,
+            "checkout_at": checkout, "due_date": due, "returned_at": None, "is_overdue": due < now,
+        }
+    for _ in range(count - len(open_books)):
+        employee_id, name = rng.choice(employees)
+        checkout = now - timedelta(seconds=rng.randrange(2 * LOAN_DAYS * 86400, HISTORY_DAYS * 86400))
+        due = checkout + timedelta(days=LOAN_DAYS)
+        returned = checkout + timedelta(seconds=rng.randrange(3600, (LOAN_DAYS + 7) * 86400))
+        yield {
+            "book_id": rng.choice(book_ids), "employee_id": employee_id, "borrower": name,
+            "checkout_at": checkout, "due_date": due, "returned_at": returned, "is_overdue": returned > due,
+        }
+
+def generate_synthetic_data(db, books=100_000, employees=10_000, loans=1_000_000, on_loan=0.1,
+                            seed=0, batch_size=DEFAULT_SEED_BATCH_SIZE, progress=None) -> SeedReport:
+    """Bulk-insert a reproducible synthetic dataset on top of existing data.
+
+    `on_loan` is the fraction of the new books that end up borrowed, each
+    with one open loan; the remaining loans are returned history."""
+    rng = random.Random(seed)
+    now = datetime.utcnow().replace(microsecond=0)
+    report = SeedReport()
+
+    genre_ids = list(db.scalars(select(Genre.id)))
+
+    first_employee = _max_id(db, Employee) + 1
+    report.employees = _insert_batches(
+        db, Employee, _employee_rows(rng, first_employee, employees, now), batch_size, "employees", progress
+    )
+    first_book = _max_id(db, Book) + 1
+    report.books = _insert_batches(
+        db, Book, _book_rows(rng, first_book, books, genre_ids, now), batch_size, "books", progress
+    )
+
+    if loans and report.books:
+        employee_rows = db.execute(
+            select(Employee.id, Employee.name).where(Employee.id >= first_employee)
+        ).all() or db.execute(select(Employee.id, Employee.name)).all()
+        book_ids = list(db.scalars(select(Book.id).where(Book.id >= first_book)))
+        if not employee_rows:
+            raise ValueError("Loans need at least one employee")
+
+        open_books = rng.sample(book_ids, min(int(len(book_ids) * on_loan), loans, len(book_ids)))
+        loan_rows = _loan_rows(rng, book_ids, [tuple(row) for row in employee_rows], loans, open_books, now)
+        report.loans = _insert_batches(db, Loan, loan_rows, batch_size, "loans", progress)
+        report.open_loans = len(open_books)
+
+        # Mirror the open loans onto books, as checkout does
+        open_loans = (
+            select(Loan.book_id, Loan.employee_id, Loan.borrower, Loan.due_date)
+            .where(Loan.book_id >= first_book, Loan.returned_at.is_(None))
+            .subquery()
+        )
+        db.execute(
+            update(Book)
+            .where(Book.id == open_loans.c.book_id)
+            .values(
+                status=BookStatus.borrowed,
+                borrower=open_loans.c.borrower,
+                borrower_employee_id=open_loans.c.employee_id,
+                due_date=open_loans.c.due_date,
+            )
+        )
+        db.commit()
+    return report
@@ -0,0 +1,76 @@
+"""Dashboard statistics with a short-lived in-process cache.
+
+Book status counts come from one GROUP BY query and loan/reservation counts
+from one conditional aggregate each. The snapshot is kept for STATS_CACHE_TTL
+seconds; checkout, return and reservation handlers call
+`invalidate_stats()` so the local worker never shows its own writes late.
+
+The snapshot is computed outside the lock, which only guards the swap: the
+async handlers call get_stats through run_sync on the event-loop thread, and
+blocking there while another request's queries need the loop would hang the
+worker. A load that overlaps an invalidation is returned but not cached.
+"""
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import case, func
+
+from .models import Book, BookStatus, Loan, Reservation, ReservationStatus
+
+STATS_CACHE_TTL = float(os.getenv("STATS_CACHE_TTL", "10"))
+
+_lock = threading.Lock()
+_snapshot: Optional[dict] = None
+_loaded_at = 0.0
+_generation = 0  # bumped by invalidate_stats()
+
+def compute_stats(db) -> dict:
+    status_counts = {status: 0 for status in BookStatus}
+    for status, count in db.query(Book.status, func.count(Book.id)).group_by(Book.status):
+        status_counts[status] = count
+
+    now = datetime.now()
+    active_loans, overdue_loans = db.query(
+        func.count(Loan.id),
+        func.coalesce(func.sum(case((Loan.due_date < now, 1), else_=0)), 0)
+    ).filter(Loan.returned_at.is_(None)).one()
+
+    active_reservations = db.query(func.count(Reservation.id)).filter(
+        Reservation.status == ReservationStatus.active
+    ).scalar()
+
+    return {
+        "total_books": sum(status_counts.values()),
+        "available_books": status_counts[BookStatus.available],
+        "borrowed_books": status_counts[BookStatus.borrowed],
+        "reserved_books": status_counts[BookStatus.reserved],
+        "active_loans": active_loans,
+        "overdue_loans": overdue_loans,
+        "active_reservations": active_reservations,
+        "generated_at": now.isoformat()
+    }
+
+def get_stats(db) -> dict:
+    """Return the cached stats snapshot, recomputing it once the TTL has passed"""
+    global _snapshot, _loaded_at
+    now = time.monotonic()
+    snapshot = _snapshot
+    if snapshot is not None and now - _loaded_at < STATS_CACHE_TTL:
+        return snapshot
+
+    generation = _generation
+    snapshot = compute_stats(db)
+    with _lock:
+        if generation == _generation:
+            _snapshot = snapshot
+            _loaded_at = now
+    return snapshot
+
+def invalidate_stats():
+    global _snapshot, _generation
+    with _lock:
+        _snapshot = None
+        _generation += 1
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Link legacy borrower/reserver names to employees in the configured DATABASE_URL
+
+Usage:
+    python backfill_employees.py [--chunk-size 5000]
+
+Safe to run while the application is serving and to re-run: each chunk is
+committed separately and only rows still missing an employee are touched.
+"""
+import argparse
+import time
+
+from app.backfill import DEFAULT_BACKFILL_CHUNK_SIZE, backfill_employee_links
+from app.database import SessionLocal
+
+def main():
+    parser = argparse.ArgumentParser(description="Resolve legacy borrower/reserver names to employee ids")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_BACKFILL_CHUNK_SIZE,
+                        help="rows per UPDATE transaction")
+    args = parser.parse_args()
+
+    started = time.monotonic()
+
+    def progress(table, linked):
+        print(f"  {table}: {linked} rows linked ({time.monotonic() - started:.1f}s)", end="\r")
+
+    db = SessionLocal()
+    try:
+        reports = backfill_employee_links(db, chunk_size=args.chunk_size, progress=progress)
+    finally:
+        db.close()
+
+    print()
+    for report in reports:
+        line = (f"{report.table}: {report.linked} linked, {report.unknown} unknown names, "
+                f"{report.ambiguous} ambiguous names")
+        if report.cancelled:
+            line += f", {report.cancelled} duplicate reservations cancelled"
+        print(line)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""
+Benchmark the main HTTP endpoints against a synthetic dataset
+
+Each backend (SQLite always, PostgreSQL with --postgres) runs in its own
+process with DATABASE_URL pointing at it: the schema is migrated, the
+synthetic dataset from app/seed.py is generated if the database has no
+books, and the FastAPI app is driven in-process through httpx's ASGI
+transport. For every endpoint it reports p50/p95/p99 latency, requests per
+second and SQL statements per request, and writes everything to a JSON file
+that can be compared with a previous run.
+
+Endpoints with a QUERY_BUDGETS entry also get one request with the in-process
+caches (stats, genres, employees) cleared, since the measured requests are
+mostly served from them. The run exits with status 1 if either count is over
+the budget, or if --compare finds a regression.
+
+Usage:
+    python benchmark.py [--postgres postgresql://.../scratch_db] [--requests 200]
+                        [--books 10000] [--employees 1000] [--loans 100000]
+                        [--output benchmark.json] [--compare baseline.json]
+
+The PostgreSQL database is written to (seeding, checkouts); use a scratch one.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import ExitStack
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# name -> (method, path template, QUERY_BUDGETS key or None)
+ENDPOINTS = {
+    "GET /": ("GET", "/", "/"),
+    "GET /books": ("GET", "/books", "/books"),
+    "GET /books?q=": ("GET", "/books?q={q}", None),
+    "GET /books/{id}": ("GET", "/books/{book_id}", "/books/{book_id}"),
+    "POST /books/{id}/checkout": ("POST", "/books/{available_id}/checkout", None),
+    "POST /books/{id}/return": ("POST", "/books/{available_id}/return", None),
+    "GET /loans": ("GET", "/loans", "/loans"),
+    "GET /overdue": ("GET", "/overdue", "/overdue"),
+    "GET /reservations": ("GET", "/reservations", "/reservations"),
+    "GET /genres": ("GET", "/genres", "/genres"),
+    "GET /employees": ("GET", "/employees", None),
+    "GET /employees/{id}": ("GET", "/employees/{employee_id}", "/employees/{employee_id}"),
+    "GET /api/stats": ("GET", "/api/stats", None),
+    "GET /api/books": ("GET", "/api/books", None),
+    "GET /api/books/search": ("GET", "/api/books/search?q={q}", None),
+    "GET /api/genres/tree": ("GET", "/api/genres/tree", None),
+    "GET /api/employees/active": ("GET", "/api/employees/active", None),
+}
+
+SEARCH_TERMS = ["Python", "データベース", "入門", "機械学習", "SQL", "佐藤"]
+RESERVATIONS = 500
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# --- worker: runs inside the per-backend process -------------------------
+
+def prepare_database(args):
+    """Migrate and, if empty, seed the database; returns ids to request"""
+    from sqlalchemy import func, insert, select
+
+    from app import migrations
+    from app.database import SessionLocal, engine
+    from app.models import Book, BookStatus, Employee, Loan, Reservation, ReservationStatus
+    from app.seed import create_sample_data, generate_synthetic_data
+
+    migrations.upgrade(engine)
+    db = SessionLocal()
+    try:
+        if not db.scalar(select(func.count(Book.id))):
+            print(f"  seeding {args.books} books, {args.employees} employees, {args.loans} loans...", file=sys.stderr)
+            create_sample_data(db)
+            generate_synthetic_data(
+                db, books=args.books, employees=args.employees, loans=args.loans, seed=args.seed
+            )
+            borrowed = db.execute(
+                select(Book.id).where(Book.status == BookStatus.borrowed).limit(RESERVATIONS)
+            ).scalars().all()
+            employees = db.execute(select(Employee.id, Employee.name).limit(RESERVATIONS)).all()
+            if borrowed and employees:
+                now = datetime.utcnow()
+                db.execute(insert(Reservation), [
+                    {
+                        "book_id": book_id, "employee_id": employees[i % len(employees)].id,
+                        "reserver": employees[i % len(employees)].name, "status": ReservationStatus.active,
+                        "reserved_at": now - timedelta(minutes=i),
+                    }
+                    for i, book_id in enumerate(borrowed)
+                ])
+                db.commit()
+
+        book_ids = db.execute(select(Book.id)).scalars().all()
+        available_ids = db.execute(
+            select(Book.id).where(Book.status == BookStatus.available)
+        ).scalars().all()
+        employee_id = db.scalar(select(Employee.id).order_by(Employee.id))
+        dataset = {
+            "books": len(book_ids),
+            "employees": db.scalar(select(func.count(Employee.id))),
+            "loans": db.scalar(select(func.count(Loan.id))),
+        }
+    finally:
+        db.close()
+    return book_ids, available_ids, employee_id, dataset
+
+def clear_caches():
+    """Drop the in-process caches so the next request runs every query it can"""
+    from app.employee_directory import invalidate_department_facets, invalidate_employee_index
+    from app.genre_cache import invalidate_genre_cache
+    from app.stats import invalidate_stats
+
+    invalidate_stats()
+    invalidate_genre_cache()
+    invalidate_employee_index()
+    invalidate_department_facets()
+
+async def run_endpoint(client, engines, name, paths, form, concurrency):
+    from app.queries import count_queries
+
+    latencies = []
+    statuses = {}
+    semaphore = asyncio.Semaphore(concurrency)
+    method = ENDPOINTS[name][0]
+
+    async def one(path):
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.request(method, path, data=form)
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    with ExitStack() as stack:
+        statements = [stack.enter_context(count_queries(engine)) for engine in engines]
+        started = time.perf_counter()
+        await asyncio.gather(*(one(path) for path in paths))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    queries = sum(len(s) for s in statements)
+    return {
+        "requests": len(paths),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "mean_ms": round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+        "rps": round(len(paths) / elapsed, 1) if elapsed else 0.0,
+        "queries_per_request": round(queries / len(paths), 2) if paths else 0.0,
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+    }
+
+async def run_worker(args):
+    import httpx
+
+    book_ids, available_ids, employee_id, dataset = prepare_database(args)
+
+    from app.database import async_engine, engine
+    from app.main import app
+    from app.queries import QUERY_BUDGETS
+
+    rng = random.Random(args.seed)
+    n = args.requests
+    checkout_ids = rng.sample(available_ids, min(n + args.warmup, len(available_ids)))
+    due_date = (datetime.now() + timedelta(days=14)).strftime("%Y-%m-%d")
+
+    def paths_for(name, count, offset=0):
+        template = ENDPOINTS[name][1]
+        return [
+            template.format(
+                q=rng.choice(SEARCH_TERMS),
+                book_id=rng.choice(book_ids),
+                employee_id=employee_id,
+                available_id=checkout_ids[(offset + i) % len(checkout_ids)],
+            )
+            for i in range(count)
+        ]
+
+    results = {}
+    engines = [engine, async_engine.sync_engine]
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        for name, (method, template, budget_key) in ENDPOINTS.items():
+            if name in args.skip:
+                continue
+            form = {"employee_id": employee_id, "due_date": due_date} if name.endswith("/checkout") else None
+            if "{available_id}" in template and not checkout_ids:
+                continue
+            cold = None
+            if budget_key:
+                clear_caches()
+                cold = await run_endpoint(client, engines, name, paths_for(name, 1), form, 1)
+            # Checkout and return walk the same books: warmup ids first, then measured ones
+            await run_endpoint(client, [], name, paths_for(name, args.warmup), form, 1)
+            result = await run_endpoint(
+                client, engines, name, paths_for(name, n, offset=args.warmup), form, args.concurrency
+            )
+            if cold:
+                result["cold_queries"] = cold["queries_per_request"]
+                result["query_budget"] = QUERY_BUDGETS.get(budget_key)
+            results[name] = result
+            print(f"  {name:30} p50 {result['p50_ms']:8.2f}ms  p95 {result['p95_ms']:8.2f}ms  "
+                  f"p99 {result['p99_ms']:8.2f}ms  {result['rps']:8.1f} req/s  "
+                  f"{result['queries_per_request']:6.2f} queries", file=sys.stderr)
+
+    await async_engine.dispose()
+    return {"database": engine.dialect.name, "dataset": dataset, "endpoints": results}
+
+# --- driver ----------------------------------------------------------------
+
+def run_backend(label, database_url, args):
+    print(f"[{label}] {database_url}", file=sys.stderr)
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as handle:
+        result_path = handle.name
+    command = [sys.executable, os.path.abspath(__file__), "--worker", result_path] + args.passthrough
+    try:
+        subprocess.run(command, cwd=ROOT, env={**os.environ, "DATABASE_URL": database_url,
+                                               "OVERDUE_SWEEP_INTERVAL": "0", "LOG_LEVEL": "WARNING"},
+                       check=True)
+        with open(result_path, encoding="utf-8") as f:
+            return json.load(f)
+    finally:
+        os.unlink(result_path)
+
+def compare(baseline, current, threshold):
+    """Print p95 and query-count changes; returns the number of regressions"""
+    regressions = 0
+    for backend, result in current["backends"].items():
+        old_backend = baseline.get("backends", {}).get(backend)
+        if not old_backend:
+            continue
+        print(f"\n[{backend}] vs {baseline.get('commit') or 'baseline'}")
+        for name, stats in result["endpoints"].items():
+            old = old_backend["endpoints"].get(name)
+            if not old:
+                continue
+            change = (stats["p95_ms"] - old["p95_ms"]) / old["p95_ms"] * 100 if old["p95_ms"] else 0.0
+            flags = []
+            if change > threshold:
+                flags.append("SLOWER")
+            if stats["queries_per_request"] > old["queries_per_request"]:
+                flags.append("MORE QUERIES")
+            regressions += bool(flags)
+            print(f"  {name:30} p95 {old['p95_ms']:8.2f} -> {stats['p95_ms']:8.2f}ms ({change:+6.1f}%)  "
+                  f"queries {old['queries_per_request']:.2f} -> {stats['queries_per_request']:.2f}"
+                  + (f"  {' '.join(flags)}" if flags else ""))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the main endpoints on a synthetic dataset")
+    parser.add_argument("--sqlite", default=os.path.join(tempfile.gettempdir(), "library-benchmark.db"),
+                        help="SQLite file to seed and benchmark (recreated unless --keep)")
+    parser.add_argument("--postgres", help="PostgreSQL URL of a scratch database to benchmark as well")
+    parser.add_argument("--keep", action="store_true", help="reuse an existing SQLite benchmark file")
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per endpoint")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--books", type=int, default=10_000)
+    parser.add_argument("--employees", type=int, default=1_000)
+    parser.add_argument("--loans", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skip", action="append", default=[], help="endpoint name to skip (repeatable)")
+    parser.add_argument("--output", default="benchmark.json")
+    parser.add_argument("--compare", help="previous JSON output to diff against")
+    parser.add_argument("--threshold", type=float, default=20.0, help="p95 slowdown (%%) flagged as regression")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        result = asyncio.run(run_worker(args))
+        with open(args.worker, "w", encoding="utf-8") as f:
+            json.dump(result, f)
+        return
+
+    args.passthrough = [
+        "--requests", str(args.requests), "--warmup", str(args.warmup), "--concurrency", str(args.concurrency),
+        "--books", str(args.books), "--employees", str(args.employees), "--loans", str(args.loans),
+        "--seed", str(args.seed),
+    ] + [option for name in args.skip for option in ("--skip", name)]
+
+    if not args.keep:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(args.sqlite + suffix):
+                os.remove(args.sqlite + suffix)
+    backends = {"sqlite": run_backend("sqlite", f"sqlite:///{args.sqlite}", args)}
+    if args.postgres:
+        backends["postgresql"] = run_backend("postgresql", args.postgres, args)
+
+    report = {
+        "commit": git_commit(),
+        "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "settings": {"requests": args.requests, "warmup": args.warmup, "concurrency": args.concurrency,
+                     "seed": args.seed},
+        "backends": backends,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Results written to {args.output}")
+
+    over_budget = [
+        f"{backend}: {name} ({stats['queries_per_request']} warm, {stats['cold_queries']} cold "
+        f"> {stats['query_budget']})"
+        for backend, result in backends.items()
+        for name, stats in result["endpoints"].items()
+        if stats.get("query_budget") is not None
+        and max(stats["queries_per_request"], stats["cold_queries"]) > stats["query_budget"]
+    ]
+    for line in over_budget:
+        print(f"Over query budget: {line}")
+    failed = bool(over_budget)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(json.load(f), report, args.threshold)
+        if regressions:
+            print(f"\n{regressions} endpoint(s) regressed")
+            failed = True
+
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
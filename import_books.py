@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Bulk import books from a CSV or JSONL file
+Usage: python import_books.py books.csv [--format csv|jsonl] [--batch-size 1000]
+"""
+import argparse
+import time
+
+from app.database import SessionLocal
+from app.importer import import_books, detect_format, clamp_batch_size, DEFAULT_BATCH_SIZE
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import books from CSV/JSONL")
+    parser.add_argument("path", help="CSV (header row) or JSONL file")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="defaults to the file extension")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    fmt = args.format or detect_format(args.path)
+    started = time.monotonic()
+
+    def progress(report):
+        elapsed = time.monotonic() - started
+        rate = report.read / elapsed if elapsed else 0
+        print(f"  read {report.read}, inserted {report.inserted}, duplicates {report.duplicates}, "
+              f"rejected {report.rejected} ({rate:.0f} rows/s)")
+
+    db = SessionLocal()
+    try:
+        with open(args.path, encoding="utf-8-sig", newline="") as stream:
+            report = import_books(db, stream, fmt, batch_size=clamp_batch_size(args.batch_size), progress=progress)
+    finally:
+        db.close()
+
+    print("Import completed!")
+    for reject in report.rejects:
+        print(f"  line {reject['line']}: {reject['reason']}")
+    if report.rejected > len(report.rejects):
+        print(f"  ... and {report.rejected - len(report.rejects)} more rejected rows")
+
+if __name__ == "__main__":
+    main()
@@ -2,164 +2,406 @@
 """
 Data migration script for moving from SQLite to PostgreSQL
 Run this script to migrate existing data when switching databases
+
+Rows are streamed from SQLite with fetchmany() and written in large batches
+(COPY on PostgreSQL, executemany elsewhere) with their original IDs, so no
+ID remapping is needed. Tables are ordered by their foreign keys in
+Base.metadata; each table is split into id-range chunks that are copied
+concurrently on a thread pool, each worker writing through its own pooled
+target connection. Progress is checkpointed per chunk in the
+`migration_checkpoints` table of the target database, in the same
+transaction as each batch, so an interrupted run resumes where it stopped.
+
+Usage: python migrate_data.py [--source ./library.db] [--batch-size 5000]
+                              [--workers N] [--chunk-size 50000] [--restart]
 """
+import argparse
+import csv
+import io
 import os
-import sys
 import sqlite3
+import sys
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime
 
+from sqlalchemy import Boolean, Column, DateTime, Integer, MetaData, String, Table, bindparam, func, insert, select, text, update
+
 # Add the app directory to the path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'app'))
 
-from app.database import SessionLocal, engine
-from app.models import Base, Book, Genre, Loan, Reservation, BookStatus, ReservationStatus
+from app import migrations
+from app.database import MAX_OVERFLOW, POOL_SIZE, engine
+from app.models import Base
+
+DEFAULT_BATCH_SIZE = 5000
+DEFAULT_CHUNK_SIZE = 50000
+
+checkpoint_metadata = MetaData()
+migration_checkpoints = Table(
+    "migration_checkpoints", checkpoint_metadata,
+    Column("name", String, primary_key=True),
+    Column("last_id", Integer, nullable=False, default=0),
+    Column("rows_copied", Integer, nullable=False, default=0),
+    Column("completed", Boolean, nullable=False, default=False),
+    Column("updated_at", DateTime, nullable=False, default=datetime.utcnow),
+)
+
+def _parse_datetime(value):
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value)
+
+def _converters(table):
+    """Per-column converters from SQLite storage values to Python values"""
+    converters = {}
+    for column in table.columns:
+        if isinstance(column.type, DateTime):
+            converters[column.name] = _parse_datetime
+        elif isinstance(column.type, Boolean):
+            converters[column.name] = lambda v: None if v is None else bool(v)
+    return converters
+
+def _source_columns(sqlite_conn, table_name):
+    return [row[1] for row in sqlite_conn.execute(f"PRAGMA table_info({table_name})")]
+
+def _source_has_table(sqlite_conn, table_name):
+    return sqlite_conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,)
+    ).fetchone() is not None
+
+def load_checkpoint(conn, name):
+    row = conn.execute(select(migration_checkpoints).where(migration_checkpoints.c.name == name)).first()
+    return row._asdict() if row else {"name": name, "last_id": 0, "rows_copied": 0, "completed": False}
+
+def save_checkpoint(conn, name, last_id, rows_copied, completed=False):
+    values = {"last_id": last_id, "rows_copied": rows_copied, "completed": completed, "updated_at": datetime.utcnow()}
+    result = conn.execute(update(migration_checkpoints).where(migration_checkpoints.c.name == name).values(**values))
+    if result.rowcount == 0:
+        conn.execute(insert(migration_checkpoints).values(name=name, **values))
+
+def copy_rows(conn, table, rows):
+    """Bulk-insert a batch of dict rows on an open target connection"""
+    if conn.dialect.name == "postgresql":
+        columns = list(rows[0].keys())
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow(["" if row[c] is None else row[c] for c in columns])
+        buffer.seek(0)
+        cursor = conn.connection.cursor()
+        # Unquoted empty fields are NULL in CSV COPY
+        cursor.copy_expert(f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    else:
+        conn.execute(insert(table), rows)
+
+class RowMapper:
+    """Turns SQLite rows into target rows for one table"""
+
+    def __init__(self, table, source_columns, employee_ids_by_name):
+        self.table = table
+        self.columns = [c.name for c in table.columns if c.name in source_columns]
+        self.converters = _converters(table)
+        self.employee_ids_by_name = employee_ids_by_name
+
+    def __call__(self, source_row):
+        row = {}
+        for name in self.columns:
+            value = source_row[name]
+            convert = self.converters.get(name)
+            row[name] = convert(value) if convert else value
+
+        name = self.table.name
+        if name == "genres":
+            # Parents are linked after all genres exist (see fix_genre_parents)
+            row["parent_id"] = None
+        elif name == "loans" and row.get("employee_id") is None:
+            row["employee_id"] = self.employee_ids_by_name.get(source_row["borrower"])
+        elif name == "reservations" and row.get("employee_id") is None:
+            row["employee_id"] = self.employee_ids_by_name.get(source_row["reserver"])
+
+        for column in self.table.columns:
+            # Fill required columns missing from older SQLite schemas
+            if row.get(column.name) is None and not column.nullable and column.default is not None:
+                default = column.default.arg
+                row[column.name] = default(None) if callable(default) else default
+        return row
+
+    def rejects(self, row):
+        """Reason a mapped row cannot be inserted, or None"""
+        for column in self.table.columns:
+            if not column.nullable and row.get(column.name) is None:
+                return f"{column.name} is NULL"
+        return None
+
+def table_dependencies():
+    """Map each table in Base.metadata to the tables its foreign keys point at.
+
+    The genres self-reference is left out: parent links are restored by
+    fix_genre_parents once every genre row exists."""
+    return {
+        name: {fk.column.table.name for fk in table.foreign_keys if fk.column.table is not table}
+        for name, table in Base.metadata.tables.items()
+    }
+
+def plan_chunks(sqlite_conn, table_name, chunk_size):
+    """Split a source table into (start, end] id ranges.
+
+    Ranges are aligned to multiples of chunk_size so a resumed run with the
+    same --chunk-size finds the same chunk checkpoints."""
+    low, high = sqlite_conn.execute(f"SELECT MIN(id), MAX(id) FROM {table_name}").fetchone()
+    if low is None:
+        return []
+    return [
+        (k * chunk_size, (k + 1) * chunk_size)
+        for k in range((low - 1) // chunk_size, (high - 1) // chunk_size + 1)
+    ]
+
+def _chunk_name(table_name, start, end):
+    return f"{table_name}:{start}-{end}"
+
+def _check_chunk_layout(conn, table_name, chunks):
+    planned = {_chunk_name(table_name, start, end) for start, end in chunks}
+    existing = set(conn.execute(
+        select(migration_checkpoints.c.name).where(migration_checkpoints.c.name.like(f"{table_name}:%"))
+    ).scalars())
+    if existing - planned:
+        raise SystemExit(
+            f"{table_name}: checkpoints were written with a different --chunk-size; "
+            "re-run with the previous value or use --restart"
+        )
+
+def migrate_chunk(sqlite_path, table, start, end, resume_after, batch_size, employee_ids_by_name):
+    """Copy ids in (start, end] of one table in checkpointed batches.
+
+    Runs on a worker thread with its own SQLite connection; each batch is
+    written on a target connection taken from the engine pool. Returns
+    (rows copied by this run, rows rejected, seconds)."""
+    name = _chunk_name(table.name, start, end)
+    with engine.begin() as conn:
+        checkpoint = load_checkpoint(conn, name)
+    if checkpoint["completed"]:
+        return 0, 0, 0.0
+
+    sqlite_conn = sqlite3.connect(sqlite_path)
+    sqlite_conn.row_factory = sqlite3.Row
+    try:
+        mapper = RowMapper(table, _source_columns(sqlite_conn, table.name), employee_ids_by_name)
+        last_id = max(start, resume_after, checkpoint["last_id"])
+        copied = checkpoint["rows_copied"]
+        rejected = 0
+        started = time.monotonic()
+
+        cursor = sqlite_conn.execute(
+            f"SELECT * FROM {table.name} WHERE id > ? AND id <= ? ORDER BY id", (last_id, end)
+        )
+        while True:
+            source_rows = cursor.fetchmany(batch_size)
+            if not source_rows:
+                break
+
+            batch = []
+            for source_row in source_rows:
+                row = mapper(source_row)
+                if mapper.rejects(row):
+                    rejected += 1
+                    continue
+                batch.append(row)
+
+            last_id = source_rows[-1]["id"]
+            with engine.begin() as conn:
+                if batch:
+                    copy_rows(conn, table, batch)
+                copied += len(batch)
+                save_checkpoint(conn, name, last_id, copied)
+
+        with engine.begin() as conn:
+            save_checkpoint(conn, name, last_id, copied, completed=True)
+        return copied - checkpoint["rows_copied"], rejected, time.monotonic() - started
+    finally:
+        sqlite_conn.close()
+
+def fix_genre_parents(sqlite_conn):
+    """Restore genres.parent_id once every genre row exists"""
+    pairs = [
+        {"genre_id": row["id"], "parent": row["parent_id"]}
+        for row in sqlite_conn.execute("SELECT id, parent_id FROM genres WHERE parent_id IS NOT NULL")
+    ]
+    if pairs:
+        genres = Base.metadata.tables["genres"]
+        with engine.begin() as conn:
+            conn.execute(
+                update(genres).where(genres.c.id == bindparam("genre_id")).values(parent_id=bindparam("parent")),
+                pairs
+            )
+
+def reset_sequences():
+    """Move PostgreSQL id sequences past the copied IDs"""
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.begin() as conn:
+        for table_name in Base.metadata.tables:
+            conn.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{table_name}', 'id'), "
+                f"COALESCE((SELECT MAX(id) FROM {table_name}), 0) + 1, false)"
+            ))
+
+def employee_name_map(sqlite_conn):
+    """Legacy loans/reservations without employee_id resolve by employee name.
+
+    Returns (name -> id for names held by one employee, set of names shared
+    by several). As in app/backfill.py, shared names stay unresolved rather
+    than going to an arbitrary one of the employees."""
+    if not _source_has_table(sqlite_conn, "employees"):
+        return {}, set()
+    rows = sqlite_conn.execute("SELECT id, name FROM employees").fetchall()
+    counts = Counter(row["name"] for row in rows)
+    ids = {row["name"]: row["id"] for row in rows if counts[row["name"]] == 1}
+    return ids, {name for name, count in counts.items() if count > 1}
+
+def default_workers():
+    """Concurrent copy workers: one per core, bounded by the target pool.
+
+    SQLite targets serialise writers, so they get a single worker."""
+    if engine.dialect.name == "sqlite":
+        return 1
+    return max(1, min(os.cpu_count() or 1, POOL_SIZE + MAX_OVERFLOW))
+
+def migrate_from_sqlite(sqlite_path="./library.db", batch_size=DEFAULT_BATCH_SIZE, restart=False,
+                        workers=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Migrate data from SQLite to PostgreSQL
+
+    Tables are scheduled from the foreign-key graph: a table starts once all
+    tables it references are complete, and its id-range chunks are copied
+    concurrently with any other ready table's chunks."""
 
-def migrate_from_sqlite():
-    """Migrate data from SQLite to PostgreSQL"""
-    
     # Check if SQLite database exists
-    sqlite_path = "./library.db"
     if not os.path.exists(sqlite_path):
-        print("No SQLite database found at ./library.db")
+        print(f"No SQLite database found at {sqlite_path}")
         return
-    
-    print("Starting data migration from SQLite to PostgreSQL...")
-    
-    # Create all tables in the target database
-    Base.metadata.create_all(bind=engine)
-    
-    # Connect to SQLite
+
+    workers = workers or default_workers()
+    print(f"Starting data migration from SQLite to PostgreSQL ({workers} workers)...")
+
+    # Bring the target schema up to date
+    migrations.upgrade(engine)
+    checkpoint_metadata.create_all(bind=engine)
+    if restart:
+        with engine.begin() as conn:
+            conn.execute(migration_checkpoints.delete())
+
+    # Connect to SQLite (planning and genre parents only; workers open their own)
     sqlite_conn = sqlite3.connect(sqlite_path)
     sqlite_conn.row_factory = sqlite3.Row  # Enable column access by name
-    sqlite_cursor = sqlite_conn.cursor()
-    
-    # Connect to target database (PostgreSQL)
-    db = SessionLocal()
-    
+
     try:
-        # Migrate Genres
-        print("Migrating genres...")
-        sqlite_cursor.execute("SELECT * FROM genres ORDER BY level, name")
-        genres = sqlite_cursor.fetchall()
-        
-        genre_id_map = {}  # Map old IDs to new IDs
-        
-        for genre_row in genres:
-            genre = Genre(
-                name=genre_row['name'],
-                parent_id=None,  # Will be updated in second pass
-                level=genre_row['level'],
-                description=genre_row['description'],
-                created_at=datetime.fromisoformat(genre_row['created_at']) if genre_row['created_at'] else datetime.utcnow(),
-                updated_at=datetime.fromisoformat(genre_row['updated_at']) if genre_row['updated_at'] else datetime.utcnow()
-            )
-            db.add(genre)
-            db.flush()  # Get the new ID
-            genre_id_map[genre_row['id']] = genre.id
-        
-        db.commit()
-        
-        # Update parent_id relationships
-        print("Updating genre parent relationships...")
-        for genre_row in genres:
-            if genre_row['parent_id']:
-                genre = db.query(Genre).filter(Genre.id == genre_id_map[genre_row['id']]).first()
-                if genre and genre_row['parent_id'] in genre_id_map:
-                    genre.parent_id = genre_id_map[genre_row['parent_id']]
-        
-        db.commit()
-        
-        # Migrate Books
-        print("Migrating books...")
-        sqlite_cursor.execute("SELECT * FROM books")
-        books = sqlite_cursor.fetchall()
-        
-        book_id_map = {}
-        
-        for book_row in books:
-            # Map genre_id if it exists
-            mapped_genre_id = None
-            if book_row['genre_id'] and book_row['genre_id'] in genre_id_map:
-                mapped_genre_id = genre_id_map[book_row['genre_id']]
-            
-            book = Book(
-                title=book_row['title'],
-                author=book_row['author'],
-                description=book_row['description'],
-                genre_id=mapped_genre_id,
-                genre=book_row['genre'],  # Backward compatibility field
-                isbn=book_row['isbn'],
-                publisher=book_row['publisher'],
-                publication_year=book_row['publication_year'],
-                pages=book_row['pages'],
-                status=BookStatus(book_row['status']),
-                borrower=book_row['borrower'],
-                due_date=datetime.fromisoformat(book_row['due_date']) if book_row['due_date'] else None,
-                created_at=datetime.fromisoformat(book_row['created_at']) if book_row['created_at'] else datetime.utcnow(),
-                updated_at=datetime.fromisoformat(book_row['updated_at']) if book_row['updated_at'] else datetime.utcnow()
-            )
-            db.add(book)
-            db.flush()
-            book_id_map[book_row['id']] = book.id
-        
-        db.commit()
-        
-        # Migrate Loans
-        print("Migrating loans...")
-        try:
-            sqlite_cursor.execute("SELECT * FROM loans")
-            loans = sqlite_cursor.fetchall()
-            
-            for loan_row in loans:
-                if loan_row['book_id'] in book_id_map:
-                    loan = Loan(
-                        book_id=book_id_map[loan_row['book_id']],
-                        borrower=loan_row['borrower'],
-                        checkout_at=datetime.fromisoformat(loan_row['checkout_at']) if loan_row['checkout_at'] else datetime.utcnow(),
-                        due_date=datetime.fromisoformat(loan_row['due_date']) if loan_row['due_date'] else datetime.utcnow(),
-                        returned_at=datetime.fromisoformat(loan_row['returned_at']) if loan_row['returned_at'] else None,
-                        is_overdue=bool(loan_row['is_overdue']) if 'is_overdue' in loan_row.keys() else False
-                    )
-                    db.add(loan)
-            
-            db.commit()
-        except sqlite3.OperationalError:
-            print("No loans table found in SQLite database, skipping...")
-        
-        # Migrate Reservations
-        print("Migrating reservations...")
-        try:
-            sqlite_cursor.execute("SELECT * FROM reservations")
-            reservations = sqlite_cursor.fetchall()
-            
-            for res_row in reservations:
-                if res_row['book_id'] in book_id_map:
-                    reservation = Reservation(
-                        book_id=book_id_map[res_row['book_id']],
-                        reserver=res_row['reserver'],
-                        status=ReservationStatus(res_row['status']),
-                        reserved_at=datetime.fromisoformat(res_row['reserved_at']) if res_row['reserved_at'] else datetime.utcnow(),
-                        notified_at=datetime.fromisoformat(res_row['notified_at']) if res_row['notified_at'] else None,
-                        expires_at=datetime.fromisoformat(res_row['expires_at']) if res_row['expires_at'] else None
-                    )
-                    db.add(reservation)
-            
-            db.commit()
-        except sqlite3.OperationalError:
-            print("No reservations table found in SQLite database, skipping...")
-        
+        employee_ids_by_name, ambiguous_names = employee_name_map(sqlite_conn)
+        if ambiguous_names:
+            print(f"  {len(ambiguous_names)} employee names are shared by several employees; "
+                  "legacy loans/reservations under those names are not linked")
+        waiting = table_dependencies()
+        done = set()
+        summary = {}
+
+        for table_name in list(waiting):
+            if not _source_has_table(sqlite_conn, table_name):
+                print(f"No {table_name} table found in SQLite database, skipping...")
+                del waiting[table_name]
+                done.add(table_name)
+                continue
+            with engine.begin() as conn:
+                checkpoint = load_checkpoint(conn, table_name)
+            if checkpoint["completed"]:
+                print(f"  {table_name}: already migrated ({checkpoint['rows_copied']} rows), skipping")
+                del waiting[table_name]
+                done.add(table_name)
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            running = {}      # future -> table name
+            progress = {}     # table name -> [chunks left, copied, rejected, started]
+
+            def finish_table(table_name):
+                copied, rejected, started = progress.pop(table_name)[1:]
+                elapsed = time.monotonic() - started
+                with engine.begin() as conn:
+                    total = conn.execute(
+                        select(func.coalesce(func.sum(migration_checkpoints.c.rows_copied), 0))
+                        .where(migration_checkpoints.c.name.like(f"{table_name}:%"))
+                    ).scalar()
+                    max_id = sqlite_conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table_name}").fetchone()[0]
+                    save_checkpoint(conn, table_name, max_id, total, completed=True)
+                if table_name == "genres":
+                    print("Updating genre parent relationships...")
+                    fix_genre_parents(sqlite_conn)
+                summary[table_name] = (copied, rejected, elapsed)
+                print(f"  {table_name}: {copied} rows in {elapsed:.1f}s ({copied / max(elapsed, 1e-9):.0f} rows/s)"
+                      + (f", {rejected} rejected" if rejected else ""))
+                done.add(table_name)
+
+            def start_ready_tables():
+                for table_name, parents in list(waiting.items()):
+                    if not parents <= done:
+                        continue
+                    del waiting[table_name]
+                    table = Base.metadata.tables[table_name]
+                    chunks = plan_chunks(sqlite_conn, table_name, chunk_size)
+                    with engine.begin() as conn:
+                        _check_chunk_layout(conn, table_name, chunks)
+                        # A table checkpoint from a sequential (pre-chunking) run
+                        resume_after = load_checkpoint(conn, table_name)["last_id"]
+                    print(f"Migrating {table_name} ({len(chunks)} chunks)...")
+                    progress[table_name] = [len(chunks), 0, 0, time.monotonic()]
+                    if not chunks:
+                        finish_table(table_name)
+                        continue
+                    for start, end in chunks:
+                        future = pool.submit(
+                            migrate_chunk, sqlite_path, table, start, end, resume_after,
+                            batch_size, employee_ids_by_name
+                        )
+                        running[future] = table_name
+
+            start_ready_tables()
+            while running:
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    table_name = running.pop(future)
+                    copied, rejected, _ = future.result()
+                    state = progress[table_name]
+                    state[0] -= 1
+                    state[1] += copied
+                    state[2] += rejected
+                    if state[0] == 0:
+                        finish_table(table_name)
+                # Children of the tables that just finished may start now
+                start_ready_tables()
+
+            if waiting:
+                raise RuntimeError(f"Unresolvable table dependencies: {sorted(waiting)}")
+
+        reset_sequences()
+
         print("Data migration completed successfully!")
         print(f"Migrated:")
-        print(f"  - {len(genres)} genres")
-        print(f"  - {len(books)} books")
-        
+        for table_name, (copied, rejected, elapsed) in summary.items():
+            print(f"  - {copied} {table_name}")
+
     except Exception as e:
-        print(f"Error during migration: {e}")
-        db.rollback()
+        print(f"\nError during migration: {e}")
+        print("Re-run the script to resume from the last checkpoint.")
         raise
     finally:
-        db.close()
         sqlite_conn.close()
 
 if __name__ == "__main__":
-    migrate_from_sqlite()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Migrate data from SQLite to the configured DATABASE_URL")
+    parser.add_argument("--source", default="./library.db", help="SQLite database file")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--restart", action="store_true", help="ignore checkpoints from a previous run")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="concurrent copy workers (default: CPU count, capped by the DB pool; 1 for SQLite)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="ids per concurrently copied chunk; keep it unchanged when resuming")
+    args = parser.parse_args()
+    migrate_from_sqlite(args.source, args.batch_size, args.restart, args.workers, args.chunk_size)
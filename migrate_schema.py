@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Schema migration command for the configured DATABASE_URL
+
+Usage:
+    python migrate_schema.py upgrade [revision]   # apply pending migrations
+    python migrate_schema.py downgrade <revision|base>
+    python migrate_schema.py current
+    python migrate_schema.py check-plans          # EXPLAIN the router queries
+"""
+import argparse
+import sys
+
+from app import migrations
+from app.database import engine
+from app.queries import QueryPlanRegression, check_query_plans
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply versioned schema migrations")
+    commands = parser.add_subparsers(dest="command", required=True)
+    upgrade_parser = commands.add_parser("upgrade")
+    upgrade_parser.add_argument("revision", nargs="?", default=None)
+    downgrade_parser = commands.add_parser("downgrade")
+    downgrade_parser.add_argument("revision")
+    commands.add_parser("current")
+    commands.add_parser("check-plans")
+    args = parser.parse_args()
+
+    if args.command == "upgrade":
+        applied = migrations.upgrade(engine, args.revision)
+        print(f"Applied: {', '.join(applied)}" if applied else "Already up to date")
+    elif args.command == "downgrade":
+        reverted = migrations.downgrade(engine, args.revision)
+        print(f"Reverted: {', '.join(reverted)}" if reverted else "Nothing to revert")
+    elif args.command == "current":
+        print(migrations.current_revision(engine) or "base")
+        for module in migrations.pending_revisions(engine):
+            print(f"pending: {module.revision} {module.__name__.rsplit('.', 1)[-1]}")
+    elif args.command == "check-plans":
+        try:
+            check_query_plans(engine)
+        except QueryPlanRegression as e:
+            print(e)
+            sys.exit(1)
+        print("All query plans use their indexes")
+
+if __name__ == "__main__":
+    main()
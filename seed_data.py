@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Seed the configured DATABASE_URL with sample or synthetic data
+
+Usage:
+    python seed_data.py                       # demo data, only into an empty database
+    python seed_data.py --synthetic [--books 100000] [--employees 10000] [--loans 1000000]
+                        [--on-loan 0.1] [--seed 0] [--batch-size 5000]
+"""
+import argparse
+import time
+
+from app.database import SessionLocal
+from app.seed import DEFAULT_SEED_BATCH_SIZE, create_sample_data, generate_synthetic_data
+
+def main():
+    parser = argparse.ArgumentParser(description="Create sample or synthetic load-test data")
+    parser.add_argument("--synthetic", action="store_true", help="generate a large synthetic dataset")
+    parser.add_argument("--books", type=int, default=100_000)
+    parser.add_argument("--employees", type=int, default=10_000)
+    parser.add_argument("--loans", type=int, default=1_000_000)
+    parser.add_argument("--on-loan", type=float, default=0.1, help="fraction of new books left on loan")
+    parser.add_argument("--seed", type=int, default=0, help="random seed (same seed, same data)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_SEED_BATCH_SIZE)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if not args.synthetic:
+            create_sample_data(db)
+            return
+
+        started = time.monotonic()
+
+        def progress(label, count):
+            elapsed = time.monotonic() - started
+            print(f"  {label}: {count} rows ({elapsed:.1f}s)", end="\r")
+
+        report = generate_synthetic_data(
+            db, books=args.books, employees=args.employees, loans=args.loans, on_loan=args.on_loan,
+            seed=args.seed, batch_size=args.batch_size, progress=progress
+        )
+        elapsed = time.monotonic() - started
+        print(f"\nSeeded {report.employees} employees, {report.books} books, {report.loans} loans "
+              f"({report.open_loans} open) in {elapsed:.1f}s")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+// Employee typeahead for <input data-employee-target="hidden-input-id" list="datalist-id">.
+// Suggestions come from /api/employees/search; picking one stores the
+// employee's id in the hidden input that is submitted with the form.
+(function () {
+    function label(emp) {
+        return emp.employee_id + " - " + emp.name + (emp.department ? " (" + emp.department + ")" : "");
+    }
+
+    function attach(search) {
+        var options = document.getElementById(search.getAttribute("list"));
+        var hidden = document.getElementById(search.dataset.employeeTarget);
+        var byLabel = {};
+        var pending = 0;
+
+        search.addEventListener("input", function () {
+            var value = search.value;
+            hidden.value = byLabel[value] || "";
+            search.setCustomValidity(hidden.value ? "" : "候補から社員を選択してください");
+            if (hidden.value || !value.trim()) {
+                return;
+            }
+            var request = ++pending;
+            fetch("/api/employees/search?prefix=" + encodeURIComponent(value))
+                .then(function (response) { return response.json(); })
+                .then(function (employees) {
+                    if (request !== pending) {
+                        return;
+                    }
+                    options.innerHTML = "";
+                    employees.forEach(function (emp) {
+                        var option = document.createElement("option");
+                        option.value = label(emp);
+                        byLabel[option.value] = emp.id;
+                        options.appendChild(option);
+                    });
+                });
+        });
+    }
+
+    document.querySelectorAll("input[data-employee-target]").forEach(attach);
+})();